@@ -0,0 +1,56 @@
+import os
+import random
+import sys
+import tempfile
+import time
+
+from benchmarks.hierarchy import create_country_subdivisions
+from library.dataset_index import DatasetIndex, DatasetIndexWriter
+from library.model import CountryEnum, CurrencyEnum
+
+COUNTRY_COUNT = 10
+LEVEL_SIZES = (100, 2000, 10000)
+LOOKUPS = 100000
+
+
+def measure(label, function, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    elapsed = time.perf_counter() - started
+    print("{0}: {1:.2f}us".format(label, elapsed / repeat * 1000000))
+
+
+def run(country_count, level_sizes, folder_path):
+    countries = [CountryEnum('X{0}'.format(chr(ord('A') + index)), 'Country {0}'.format(index), 'C_XX', 'XXX')
+                 for index in range(country_count)]
+    subdivisions = [subdivision for country in countries
+                    for subdivision in create_country_subdivisions(country, level_sizes)]
+    currencies = [CurrencyEnum('XXX', 'Currency', '$', False)]
+    path = os.path.join(folder_path, 'dataset-{0}.idx'.format(len(subdivisions)))
+
+    started = time.perf_counter()
+    DatasetIndexWriter().write(path, countries, subdivisions, currencies, [])
+    print("{0} subdivisions: written in {1:.3f}s, {2} bytes".format(len(subdivisions), time.perf_counter() - started,
+                                                                      os.path.getsize(path)))
+
+    started = time.perf_counter()
+    with DatasetIndex(path):
+        pass
+    print("cold start: {0:.2f}us".format((time.perf_counter() - started) * 1000000))
+
+    codes = [random.choice(subdivisions).code for _ in range(LOOKUPS)]
+    with DatasetIndex(path) as index:
+        assert all(index.subdivision(subdivision.code)['name'] == subdivision.name
+                   for subdivision in subdivisions[:1000])
+        lookups = iter(codes)
+        measure('subdivision by code', lambda: index.subdivision(next(lookups)), LOOKUPS)
+        measure('country children', lambda: index.children(countries[0].code), 100)
+        measure('name prefix search', lambda: index.search(subdivisions[0].name[:6], limit=10), 10000)
+
+
+if __name__ == '__main__':
+    random.seed(int(sys.argv[1]) if len(sys.argv) > 1 else 3166)
+    with tempfile.TemporaryDirectory() as folder_path:
+        run(1, (10, 100), folder_path)
+        run(COUNTRY_COUNT, LEVEL_SIZES, folder_path)
@@ -0,0 +1,49 @@
+import os
+import re
+import shutil
+import sys
+
+from library.cache import HttpCache
+
+# Recorded fixtures are stored in the http cache format, record them by copying the http cache of a full run
+FIXTURES_FOLDER_PATH = os.path.join(os.path.dirname(__file__), 'fixtures')
+HTTP_CACHE_FOLDER_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), '.cache', 'http')
+
+# Attributes of the tables parsed out of the recorded pages, by url pattern
+PAGE_TABLES = [
+    (re.compile(r'https://www\.geonames\.org/countries/$'), {'id': 'countries'}),
+    (re.compile(r'https://www\.geonames\.org/[A-Z]{2}/administrative-division-.*\.html$'),
+     {'id': ['subdivtable1', 'subdivtable2', 'subdivtable3']}),
+    (re.compile(r'https://www\.ifcmarkets\.com/.*'), {'id': 'equities_table'}),
+    (re.compile(r'https://www\.iso\.org/obp/ui/#search$'), {'role': 'grid'}),
+    (re.compile(r'https://www\.iso\.org/obp/ui/#iso:code:3166:[A-Z]{2}$'), {'id': 'subdivision'}),
+]
+
+
+def open_fixtures(folder_path=FIXTURES_FOLDER_PATH):
+    return HttpCache(folder_path, max_bytes=sys.maxsize, offline=True)
+
+
+def load_fixture(fixtures, url):
+    return fixtures.get(url, None).content
+
+
+def get_recorded_pages(fixtures):
+    pages = {}
+    for url in sorted(fixtures.urls()):
+        for pattern, attrs in PAGE_TABLES:
+            if pattern.match(url):
+                pages[url] = attrs
+                break
+    return pages
+
+
+def record_fixtures(source_folder_path=HTTP_CACHE_FOLDER_PATH, folder_path=FIXTURES_FOLDER_PATH):
+    for file_name in os.listdir(source_folder_path):
+        if file_name.endswith('.json') or file_name.endswith('.body'):
+            shutil.copy2(os.path.join(source_folder_path, file_name), os.path.join(folder_path, file_name))
+
+
+if __name__ == '__main__':
+    record_fixtures(*sys.argv[1:2])
+    print("Recorded {0} fixtures".format(len(open_fixtures().urls())))
@@ -0,0 +1,64 @@
+import random
+import sys
+import time
+
+from collections import OrderedDict
+from library.hierarchy import SubdivisionHierarchy
+from library.model import CountryEnum, SubdivisionWithParentEnum
+
+COUNTRY_COUNT = 5
+LEVEL_SIZES = (100, 2000, 10000)
+LEGACY_LEVEL_SIZES = (20, 200, 800)
+
+
+def create_country_subdivisions(country, level_sizes):
+    subdivisions = []
+    parents = [country.code]
+    for level, size in enumerate(level_sizes, start=1):
+        codes = ['{0}-{1}{2:05d}'.format(country.code, level, index) for index in range(size)]
+        subdivisions.extend(SubdivisionWithParentEnum(code, code, 'admin{0}'.format(level), random.choice(parents),
+                                                      country) for code in codes)
+        parents = codes
+    random.shuffle(subdivisions)
+    return subdivisions
+
+
+def legacy_level(country_code, subdivision, subdivisions):
+    if subdivision.parent == country_code:
+        return 1
+    for country_subdivision in subdivisions:
+        if subdivision.parent == country_subdivision.code:
+            return 1 + legacy_level(country_code, country_subdivision, subdivisions)
+    return 0
+
+
+def legacy_sorted(country_code, subdivisions):
+    subdivisions_by_level = {}
+    for subdivision in sorted(subdivisions, key=lambda subdivision: subdivision.code):
+        subdivisions_by_level.setdefault(legacy_level(country_code, subdivision, subdivisions), []).append(subdivision)
+    sorted_subdivisions = []
+    for level in OrderedDict(sorted(subdivisions_by_level.items())):
+        sorted_subdivisions.extend(sorted(subdivisions_by_level[level], key=lambda subdivision: subdivision.code))
+    return sorted_subdivisions
+
+
+def run(label, level_sizes, sort):
+    countries = [CountryEnum('X{0}'.format(chr(ord('A') + index)), '', 'C_XX', '') for index in range(COUNTRY_COUNT)]
+    dataset = [(country, create_country_subdivisions(country, level_sizes)) for country in countries]
+    started = time.perf_counter()
+    results = [sort(country.code, subdivisions) for country, subdivisions in dataset]
+    elapsed = time.perf_counter() - started
+    total = sum(len(subdivisions) for _, subdivisions in dataset)
+    print("{0}: {1} countries, {2} subdivisions, {3:.3f}s".format(label, COUNTRY_COUNT, total, elapsed))
+    return dataset, results
+
+
+if __name__ == '__main__':
+    random.seed(int(sys.argv[1]) if len(sys.argv) > 1 else 3166)
+    run('hierarchy index', LEVEL_SIZES,
+        lambda country_code, subdivisions: SubdivisionHierarchy(country_code, subdivisions).sorted())
+
+    dataset, legacy_results = run('legacy recursive levels', LEGACY_LEVEL_SIZES, legacy_sorted)
+    for (country, subdivisions), legacy_result in zip(dataset, legacy_results):
+        assert SubdivisionHierarchy(country.code, subdivisions).sorted() == legacy_result
+    print("hierarchy index ordering matches legacy ordering")
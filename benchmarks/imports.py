@@ -0,0 +1,32 @@
+import statistics
+import subprocess
+import sys
+import time
+
+REPEAT = 7
+
+MODULES = [
+    'library',
+    'library.ifcmarkets',
+    'library.geonames',
+    'library.iso',
+    'iso3166_fetcher',
+]
+
+
+def measure(statement):
+    timings = []
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, '-c', statement], check=True)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+if __name__ == '__main__':
+    baseline = measure('pass')
+    print("interpreter startup: {0:.1f}ms".format(baseline * 1000))
+    for module in sys.argv[1:] or MODULES:
+        print("import {0}: {1:.1f}ms".format(module, (measure('import {0}'.format(module)) - baseline) * 1000))
+    statement = 'from library.ifcmarkets import CryptoCurrencyFetcher; CryptoCurrencyFetcher()'
+    print("crypto currency fetcher ready: {0:.1f}ms".format((measure(statement) - baseline) * 1000))
@@ -0,0 +1,87 @@
+import re
+import sys
+import time
+
+from benchmarks.fixtures import FIXTURES_FOLDER_PATH, get_recorded_pages, load_fixture, open_fixtures
+from library import normalization
+from library.geonames import GeonamesFetcher
+from library.tables import get_table_rows, parse_tables
+
+REPEAT = 20
+
+
+def legacy_type(type):
+    sanitized_type = type.lower()
+    for pattern in (r".*\((?P<type>.*)\).*", r"(?P<type>.*) \[english] / .* \[.*]",
+                    r"(?P<type>.*) \[french] / .* \[.*]", r".* \[.*] / (?P<type>.*) \[english]", r"(?P<type>.*) \[.*]"):
+        search_result = re.search(pattern, sanitized_type)
+        if search_result:
+            return search_result.group("type").strip()
+    return sanitized_type if sanitized_type else 'UNKNOWN'
+
+
+def legacy_alias(type):
+    for subdivision_alias in GeonamesFetcher.SubdivisionTypeAlias:
+        if type in GeonamesFetcher.SubdivisionTypeAlias[subdivision_alias]:
+            return subdivision_alias
+    return type
+
+
+def legacy_name(name):
+    name = name.replace('*', '')
+    search_result = re.search(r"(?P<name>.*) \(see also separate ISO 3166-1 entry under [A-Z]{2}\)", name)
+    if search_result:
+        return search_result.group("name").strip()
+    return name
+
+
+def legacy_identifier(type):
+    return type.upper().replace(' ', '_').replace('-', '_').replace('(', '').replace(')', '').replace(',', '')
+
+
+def compiled_type(type):
+    type = normalization.clean_type(type)
+    return GeonamesFetcher.TYPE_ALIASES.get(type, type)
+
+
+def get_raw_cells(fixtures):
+    types, names = [], []
+    for url, attrs in get_recorded_pages(fixtures).items():
+        if 'administrative-division' not in url:
+            continue
+        html = parse_tables(load_fixture(fixtures, url), **attrs)
+        for table_id, name_index, type_index in (('subdivtable1', 4, 5), ('subdivtable2', 5, 6)):
+            for cells in get_table_rows(html.find("table", id=table_id)) or []:
+                if len(cells) > type_index:
+                    names.append(cells[name_index].strip())
+                    types.append(cells[type_index].strip())
+    return types, names
+
+
+def measure(label, function, values):
+    started = time.perf_counter()
+    for _ in range(REPEAT):
+        results = [function(value) for value in values]
+    elapsed = (time.perf_counter() - started) / REPEAT
+    print("{0}: {1:.2f}us per value".format(label, elapsed / len(values) * 1000000))
+    return results
+
+
+if __name__ == '__main__':
+    types, names = get_raw_cells(open_fixtures(sys.argv[1] if len(sys.argv) > 1 else FIXTURES_FOLDER_PATH))
+    if not types:
+        sys.exit("No recorded geonames subdivision fixtures found, record them with 'python -m benchmarks.fixtures' "
+                 "or generate them with 'python -m benchmarks.synthetic'")
+    print("{0} raw type cells, {1} distinct".format(len(types), len(set(types))))
+
+    assert measure('legacy type', lambda type: legacy_alias(legacy_type(type)), types) == \
+        measure('compiled memoized type', compiled_type, types)
+    assert measure('legacy name', legacy_name, names) == measure('compiled memoized name',
+                                                                 normalization.clean_region_name, names)
+    identifiers = [normalization.clean_type(type) for type in types]
+    assert measure('legacy enum identifier', legacy_identifier, identifiers) == \
+        measure('memoized enum identifier', normalization.to_enum_identifier, identifiers)
+
+    for stats in normalization.cache_stats():
+        print("{0}: {1} hits, {2} misses, {3:.1%} hit rate".format(stats['function'], stats['hits'],
+                                                                    stats['misses'], stats['hit_rate']))
@@ -0,0 +1,162 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import iso3166_fetcher
+
+from benchmarks.fixtures import FIXTURES_FOLDER_PATH, get_recorded_pages, load_fixture, open_fixtures
+from benchmarks.hierarchy import create_country_subdivisions
+from benchmarks.stand_in import StandInServer
+from benchmarks.synthetic import create_fixtures
+from library import get_user_agent
+from library.geonames import GeonamesFetcher
+from library.http import HTTP_CLIENT
+from library.ifcmarkets import CryptoCurrencyFetcher
+from library.iso import IsoFetcher
+from library.model import CountryEnum, SubdivisionWithParentEnum
+
+GEONAMES_SUBDIVISIONS_URL = 'https://www.geonames.org/{0}/administrative-division-{1}.html'
+ISO_SUBDIVISIONS_URL = 'https://www.iso.org/obp/ui/#iso:code:3166:{0}'
+
+# Pages and feeds every pipeline run fetches, without them the stand-in answers 404 and the run fails
+REQUIRED_URLS = [IsoFetcher.COUNTRY_URL, IsoFetcher.CURRENCY_URL, IsoFetcher.DEPRECATED_CURRENCY_URL,
+                 GeonamesFetcher.COUNTRIES_URL, GeonamesFetcher.CURRENCIES_URL,
+                 CryptoCurrencyFetcher.CRYPTO_CURRENCIES_URL]
+
+
+def measure(function, repeat):
+    runs = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        runs.append(time.perf_counter() - started)
+    return {'runs': runs, 'median': statistics.median(runs), 'min': min(runs)}
+
+
+def get_geonames_countries(pages):
+    countries = []
+    for url in pages:
+        if url.startswith('https://www.geonames.org/') and 'administrative-division-' in url:
+            code = url.split('/')[3]
+            name = url.split('administrative-division-')[1][:-len('.html')]
+            countries.append(CountryEnum(code, name, 'C_XX', ''))
+    return countries
+
+
+def get_iso_pages(fixtures, pages):
+    iso_pages = []
+    for url in pages:
+        if url.startswith(ISO_SUBDIVISIONS_URL.format('')):
+            country = CountryEnum(url[-2:], '', 'C_XX', '')
+            iso_pages.append((country, load_fixture(fixtures, url).decode('utf-8')))
+    return iso_pages
+
+
+def run_pipeline():
+    with tempfile.TemporaryDirectory() as output_folder_path, tempfile.TemporaryDirectory() as cache_folder_path:
+        iso3166_fetcher.OUTPUT_FOLDER_PATH = output_folder_path
+        iso3166_fetcher.HTTP_CACHE_FOLDER_PATH = cache_folder_path
+        iso3166_fetcher.CHECKPOINT_PATH = os.path.join(cache_folder_path, 'checkpoints.sqlite')
+        iso3166_fetcher.MANIFEST_PATH = os.path.join(cache_folder_path, 'manifest.json')
+        iso3166_fetcher.SNAPSHOT_PATH = os.path.join(cache_folder_path, 'snapshot.json')
+        iso3166_fetcher.main([])
+
+
+def get_git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the fetch pipeline against recorded fixtures')
+    parser.add_argument('--fixtures', default=FIXTURES_FOLDER_PATH, help='recorded fixtures folder')
+    parser.add_argument('--synthetic', action='store_true',
+                        help='generate the seeded synthetic fixtures instead of replaying recorded ones')
+    parser.add_argument('--latency', type=float, default=0.05, help='injected latency per response in seconds')
+    parser.add_argument('--bandwidth', type=float, default=None, help='injected bandwidth in bytes per second')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per benchmark')
+    parser.add_argument('--skip-pipeline', action='store_true', help='only run the micro benchmarks')
+    parser.add_argument('--output', default=os.path.join('benchmarks', 'results', 'latest.json'),
+                        help='json results path')
+    args = parser.parse_args()
+
+    if args.synthetic:
+        with tempfile.TemporaryDirectory() as fixtures_folder_path:
+            run(args, create_fixtures(fixtures_folder_path), 'synthetic')
+        return
+
+    fixtures = open_fixtures(args.fixtures)
+    missing_urls = [url for url in REQUIRED_URLS if url not in set(fixtures.urls())]
+    if missing_urls and not args.skip_pipeline:
+        sys.exit("Fixtures in {0} miss {1}, record them with 'python -m benchmarks.fixtures' or run with "
+                 "--synthetic".format(args.fixtures, ', '.join(missing_urls)))
+    run(args, fixtures, args.fixtures)
+
+
+def run(args, fixtures, fixtures_name):
+    pages = get_recorded_pages(fixtures)
+    results = {}
+    get_user_agent()
+
+    with StandInServer(fixtures, args.latency, args.bandwidth) as stand_in:
+        HTTP_CLIENT.stand_in_url = stand_in.url
+
+        geonames_countries = get_geonames_countries(pages)
+        if geonames_countries:
+            geonames_fetcher = GeonamesFetcher()
+            results['geonames.get_country_subdivision'] = measure(
+                lambda: [geonames_fetcher.get_country_subdivision(country) for country in geonames_countries],
+                args.repeat)
+
+        if not args.skip_pipeline:
+            results['pipeline'] = measure(run_pipeline, args.repeat)
+            HTTP_CLIENT.cache = None
+        results['stand_in'] = {'requests': stand_in.requests, 'bytes_sent': stand_in.bytes_sent,
+                               'misses': sorted(set(stand_in.misses))}
+
+    iso_pages = get_iso_pages(fixtures, pages)
+    subdivisions = []
+    if iso_pages:
+        results['iso.parse_subdivisions'] = measure(
+            lambda: [IsoFetcher.parse_subdivisions(country.code, content) for country, content in iso_pages],
+            args.repeat)
+        for country, content in iso_pages:
+            subdivisions.extend(SubdivisionWithParentEnum(*row, country)
+                                for row in IsoFetcher.parse_subdivisions(country.code, content))
+    if not subdivisions:
+        subdivisions = create_country_subdivisions(CountryEnum('XA', '', 'C_XX', ''), (50, 1000, 5000))
+
+    results['sort_subdivisions'] = measure(lambda: iso3166_fetcher.sort_subdivisions(list(subdivisions)),
+                                           args.repeat)
+    results['to_java_enum'] = measure(lambda: [subdivision.to_java_enum() for subdivision in subdivisions],
+                                      args.repeat)
+
+    report = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'revision': get_git_revision(),
+        'python': sys.version,
+        'platform': platform.platform(),
+        'settings': {'fixtures': fixtures_name, 'latency': args.latency, 'bandwidth': args.bandwidth,
+                     'repeat': args.repeat, 'recorded_pages': len(pages), 'subdivisions': len(subdivisions)},
+        'results': results,
+    }
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    for name, result in results.items():
+        if 'median' in result:
+            print("{0}: {1:.3f}s median, {2:.3f}s min".format(name, result['median'], result['min']))
+    print("Results written to {0}".format(args.output))
+
+
+if __name__ == '__main__':
+    main()
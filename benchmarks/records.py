@@ -0,0 +1,61 @@
+import gc
+import random
+import sys
+import tracemalloc
+
+from dataclasses import dataclass
+from library.model import CountryEnum, SubdivisionWithParentEnum, replacements_by_code, to_type
+
+COUNTRY_COUNT = 10
+LEVEL_SIZES = (100, 2000, 10000)
+
+
+@dataclass
+class LegacySubdivisionWithParentEnum:
+    code: str
+    name: str
+    type: str
+    parent: str
+    country: CountryEnum
+
+    def to_java_enum(self):
+        up_to_date = '{0}("{1}", {2}, {3}),\n'.format(self.code.replace('-', '_'), self.name,
+                                                      to_type(self.type), self.parent.replace('-', '_'))
+        for replacement in replacements_by_code.get(self.code, []):
+            up_to_date += '{0}("{1}", {2}, {3}, {4}),\n'.format(replacement, self.name,
+                                                                to_type(self.type), self.parent.replace('-', '_'),
+                                                                self.code.replace('-', '_'))
+        return up_to_date
+
+
+def create_rows(countries, level_sizes):
+    # Every field is a new string object, as it is when parsed out of a page
+    for country in countries:
+        parents = [country.code]
+        for level, size in enumerate(level_sizes, start=1):
+            codes = ['{0}-{1}{2:05d}'.format(country.code, level, index) for index in range(size)]
+            for code in codes:
+                yield code, 'Name of {0}'.format(code), 'admin {0}'.format(level), \
+                    random.choice(parents).encode('utf-8').decode('utf-8'), country
+            parents = codes
+
+
+def measure(label, record_type, countries, seed):
+    random.seed(seed)
+    gc.collect()
+    tracemalloc.start()
+    records = [record_type(*row) for row in create_rows(countries, LEVEL_SIZES)]
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print("{0}: {1} records, {2:.1f} MiB, {3:.0f} bytes per record".format(label, len(records), current / 1048576,
+                                                                           current / len(records)))
+    return records
+
+
+if __name__ == '__main__':
+    seed = int(sys.argv[1]) if len(sys.argv) > 1 else 3166
+    countries = [CountryEnum('X{0}'.format(chr(ord('A') + index)), '', 'C_XX', '') for index in range(COUNTRY_COUNT)]
+    legacy_records = measure('legacy dataclass', LegacySubdivisionWithParentEnum, countries, seed)
+    records = measure('slotted interned', SubdivisionWithParentEnum, countries, seed)
+    assert [record.to_java_enum() for record in records] == [record.to_java_enum() for record in legacy_records]
+    print("to_java_enum output matches legacy output")
@@ -0,0 +1,82 @@
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from library.cache import CacheMiss
+from urllib.parse import unquote
+
+
+class StandInServer:
+    CHUNK_SIZE = 16 * 1024
+
+    def __init__(self, fixtures, latency=0.0, bandwidth=None, host='127.0.0.1', port=0):
+        self.fixtures = fixtures
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.host = host
+        self.port = port
+        self.requests = 0
+        self.bytes_sent = 0
+        self.misses = []
+        self.__lock = threading.Lock()
+        self.__server = None
+        self.__thread = None
+
+    @property
+    def url(self):
+        return 'http://{0}:{1}'.format(self.host, self.__server.server_address[1])
+
+    def start(self):
+        self.__server = ThreadingHTTPServer((self.host, self.port), self.__create_handler())
+        self.__server.daemon_threads = True
+        self.__thread = threading.Thread(target=self.__server.serve_forever, daemon=True)
+        self.__thread.start()
+        return self
+
+    def stop(self):
+        self.__server.shutdown()
+        self.__server.server_close()
+        self.__thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def serve(self, handler):
+        url = unquote(handler.path[1:])
+        time.sleep(self.latency)
+        try:
+            response = self.fixtures.get(url, None)
+        except CacheMiss:
+            with self.__lock:
+                self.misses.append(url)
+            handler.send_error(404, "No recorded fixture for {0}".format(url))
+            return
+
+        content = response.content
+        handler.send_response(200)
+        handler.send_header('Content-Type', response.headers.get('Content-Type', 'application/octet-stream'))
+        handler.send_header('Content-Length', str(len(content)))
+        handler.end_headers()
+        for offset in range(0, len(content), self.CHUNK_SIZE):
+            chunk = content[offset:offset + self.CHUNK_SIZE]
+            if self.bandwidth:
+                time.sleep(len(chunk) / self.bandwidth)
+            handler.wfile.write(chunk)
+        with self.__lock:
+            self.requests += 1
+            self.bytes_sent += len(content)
+
+    def __create_handler(self):
+        server = self
+
+        class StandInHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.serve(self)
+
+            def log_message(self, format, *args):
+                pass
+
+        return StandInHandler
@@ -0,0 +1,111 @@
+import random
+import sys
+
+from benchmarks.fixtures import FIXTURES_FOLDER_PATH, open_fixtures
+from library.geonames import GeonamesFetcher
+from library.ifcmarkets import CryptoCurrencyFetcher
+from library.iso import IsoFetcher
+
+# Synthetic fixtures are generated from a fixed seed, so every machine and revision benchmarks the same pages
+SEED = 3166
+COUNTRY_COUNT = 24
+GEONAMES_ONLY_COUNTRY_COUNT = 2
+LEVEL_SIZES = (6, 30)
+CURRENCY_COUNT = 40
+
+SYLLABLES = ['ba', 'co', 'da', 'fe', 'gu', 'la', 'mi', 'no', 'pa', 'ri', 'sa', 'tu', 'va', 'ze', 'lé', 'mö']
+ISO_TYPES = ['region', 'province', 'department', 'state', 'district']
+GEONAMES_TYPES = ['Region', 'Département', 'Provincia (provincia)', 'State [english] / État [french]', 'District']
+CONTINENTS = ['AF', 'AS', 'EU', 'NA', 'OC', 'SA']
+
+
+def create_name(rng, words=1):
+    return ' '.join(''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).capitalize()
+                    for _ in range(words))
+
+
+def create_countries(rng, count):
+    countries = []
+    for index in range(count):
+        code = 'X{0}'.format(chr(ord('A') + index)) if index < 26 else 'Y{0}'.format(chr(ord('A') + index - 26))
+        countries.append((code, create_name(rng), rng.choice(CONTINENTS), 'C{0:02d}'.format(index % CURRENCY_COUNT)))
+    return countries
+
+
+def create_subdivisions(rng, country_code, level_sizes):
+    subdivisions = []
+    parents = ['']
+    for level, size in enumerate(level_sizes):
+        codes = ['{0}-{1}{2:02d}'.format(country_code, level + 1, index) for index in range(size)]
+        for code in codes:
+            subdivisions.append((code, create_name(rng, rng.randint(1, 2)), level, rng.choice(parents)))
+        parents = codes
+    return subdivisions
+
+
+def create_iso_subdivision_page(country_code, subdivisions):
+    rows = []
+    for code, name, level, parent in subdivisions:
+        if code.endswith('3'):
+            name = '{0} (see also separate ISO 3166-1 entry under {1})'.format(name, country_code)
+        for language in ('en', 'fr') if code.endswith('1') else ('en',):
+            rows.append('<tr><td>{0}</td><td>{1}{2}</td><td>{3}</td><td></td><td>{4}</td><td></td><td>{5}</td></tr>'
+                        .format(ISO_TYPES[level % len(ISO_TYPES)], code, '*' if level == 0 else '', name, language,
+                                parent))
+    return '<html><div class="core-view-summary">{0}</div><table id="subdivision">{1}</table></html>'.format(
+        country_code, ''.join(rows))
+
+
+def create_geonames_subdivision_page(subdivisions):
+    rows = []
+    for code, name, level, _ in subdivisions:
+        if level == 0:
+            cells = ['', code.split('-')[1], '', '', name, GEONAMES_TYPES[int(code[-2:]) % len(GEONAMES_TYPES)]]
+            rows.append('<tr>{0}</tr>'.format(''.join('<td>{0}</td>'.format(cell) for cell in cells + [''] * 7)))
+    return '<html><table id="subdivtable1"><tr><th>code</th></tr>{0}</table></html>'.format(''.join(rows))
+
+
+def create_fixtures(folder_path=FIXTURES_FOLDER_PATH, country_count=COUNTRY_COUNT, level_sizes=LEVEL_SIZES,
+                    seed=SEED):
+    rng = random.Random(seed)
+    fixtures = open_fixtures(folder_path)
+    countries = create_countries(rng, country_count + GEONAMES_ONLY_COUNTRY_COUNT)
+    iso_countries = countries[:country_count]
+
+    def put(url, content, content_type='text/html; charset=utf-8'):
+        fixtures.put(url, content.encode('utf-8'), content_type)
+
+    put(IsoFetcher.COUNTRY_URL, '<html><table role="grid">{0}</table></html>'.format(''.join(
+        '<tr><td>{0}</td><td>{1}</td><td>{1}</td></tr>'.format(name, code) for code, name, _, _ in iso_countries)))
+    put(GeonamesFetcher.COUNTRIES_URL, '<html><table id="countries"><tr><th>code</th></tr>{0}</table></html>'.format(
+        ''.join('<tr><td>{0}</td><td></td><td></td><td></td><td>{1}</td><td></td><td></td><td></td><td>{2}</td></tr>'
+                .format(code, name, continent) for code, name, continent, _ in countries)))
+    put(GeonamesFetcher.CURRENCIES_URL, '#ISO\tISO3\n{0}'.format(''.join(
+        '{0}\t\t\t\t{1}\t\t\t\t{2}\t\t{3}\tCurrency\n'.format(code, name, continent, currency)
+        for code, name, continent, currency in countries)), 'text/plain; charset=utf-8')
+
+    for index, (code, name, _, _) in enumerate(countries):
+        subdivisions = create_subdivisions(rng, code, level_sizes)
+        put('https://www.geonames.org/{0}/administrative-division-{1}.html'.format(code, name.lower()),
+            create_geonames_subdivision_page(subdivisions))
+        if index < country_count:
+            # Every tenth iso.org country has no subdivisions, its page only renders the code summary and says so
+            put(IsoFetcher.SUBDIVISION_URL.format(code), create_iso_subdivision_page(code, subdivisions)
+                if index % 10 != 9 else '<html><div class="core-view-summary">{0}</div><p>{1}</p></html>'.format(
+                    code, IsoFetcher.NO_SUBDIVISIONS_TEXT))
+
+    put(IsoFetcher.CURRENCY_URL, '<ISO_4217><CcyTbl>{0}</CcyTbl></ISO_4217>'.format(''.join(
+        '<CcyNtry><CtryNm>{0}</CtryNm><CcyNm>Currency {1}</CcyNm><Ccy>C{1:02d}</Ccy></CcyNtry>'.format(
+            create_name(rng).upper(), index) for index in range(CURRENCY_COUNT))), 'application/xml')
+    put(IsoFetcher.DEPRECATED_CURRENCY_URL, 'Entity,Currency,AlphabeticCode,NumericCode,MinorUnit,WithdrawalDate\n'
+        '{0}'.format(''.join('{0},"Old ""{1}"" Currency",D{2:02d},{3},2,2002-03\n'.format(
+            create_name(rng).upper(), create_name(rng), index, 900 + index) for index in range(CURRENCY_COUNT // 4))),
+        'text/csv; charset=utf-8')
+    put(CryptoCurrencyFetcher.CRYPTO_CURRENCIES_URL, '<html><table id="equities_table">{0}</table></html>'.format(
+        ''.join('<tr><td>{0}</td><td>K{1:02d}</td><td>¤{1}, K{1:02d}</td></tr>'.format(create_name(rng), index)
+                for index in range(CURRENCY_COUNT // 2))))
+    return fixtures
+
+
+if __name__ == '__main__':
+    print("Generated {0} synthetic fixtures".format(len(create_fixtures(*sys.argv[1:2]).urls())))
@@ -0,0 +1,48 @@
+import sys
+import time
+import tracemalloc
+
+from benchmarks.fixtures import FIXTURES_FOLDER_PATH, get_recorded_pages, load_fixture, open_fixtures
+from bs4 import BeautifulSoup
+from library.tables import get_table_rows, parse_tables
+
+REPEAT = 5
+
+
+def full_parse(content, attrs):
+    html = BeautifulSoup(content, "html.parser")
+    return [get_table_rows(table) for table in html.find_all("table", attrs=attrs)]
+
+
+def targeted_parse(content, attrs):
+    html = parse_tables(content, **attrs)
+    return [get_table_rows(table) for table in html.find_all("table", attrs=attrs)]
+
+
+def measure(parse, content, attrs):
+    started = time.perf_counter()
+    for _ in range(REPEAT):
+        rows = parse(content, attrs)
+    elapsed = (time.perf_counter() - started) / REPEAT
+    tracemalloc.start()
+    parse(content, attrs)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return rows, elapsed, peak
+
+
+if __name__ == '__main__':
+    fixtures = open_fixtures(sys.argv[1] if len(sys.argv) > 1 else FIXTURES_FOLDER_PATH)
+    pages = get_recorded_pages(fixtures)
+    if not pages:
+        sys.exit("No recorded fixtures found, record them with 'python -m benchmarks.fixtures' or generate them with "
+                 "'python -m benchmarks.synthetic'")
+
+    for url, attrs in pages.items():
+        content = load_fixture(fixtures, url)
+        full_rows, full_time, full_peak = measure(full_parse, content, attrs)
+        targeted_rows, targeted_time, targeted_peak = measure(targeted_parse, content, attrs)
+        assert full_rows == targeted_rows, "Targeted parse differs from full parse on {0}".format(url)
+        print("{0}: {1} KiB, full {2:.1f}ms / {3} KiB peak, targeted {4:.1f}ms / {5} KiB peak".format(
+            url, len(content) // 1024, full_time * 1000, full_peak // 1024, targeted_time * 1000,
+            targeted_peak // 1024))
@@ -1,29 +1,125 @@
+import argparse
 import os
 from library.iso import IsoFetcher
 from library.geonames import GeonamesFetcher
+from library.emitter import RENDER_VERSION, AtomicFile, MultiFormatWriter
+from library.hierarchy import SubdivisionHierarchy
+from library.merge import DatasetMerger
 from library.model import to_type_enum
+from library.retry import RetryPolicy
+from library.scheduler import StageScheduler
+from library.shards import Shard, read_shards, write_shard
 from library.ifcmarkets import CryptoCurrencyFetcher
-from collections import OrderedDict
+from library.cache import HttpCache
+from library.changelog import Changelog, DatasetSnapshot
+from library.checkpoint import CheckpointStore
+from library.dataset_index import DatasetIndexWriter
+from library.manifest import Manifest
+from library.http import HTTP_CLIENT
+from library.parse_pool import PARSE_POOL
+from library.instrumentation import INSTRUMENTATION, JsonLinesSink, PrometheusTextSink
+from library import normalization
 
 # Configure chromedriver path
 CHROME_DRIVER_PATH = ''
 
+# Configure number of warm chrome sessions and pages loaded before a session is recycled
+CHROME_DRIVER_POOL_SIZE = 4
+CHROME_DRIVER_MAX_PAGES_PER_SESSION = 50
+
+# Configure chrome page load and interaction timeouts in seconds
+CHROME_PAGE_TIMEOUT = 30
+CHROME_INTERACTION_TIMEOUT = 10
+
+# Configure lean chrome profile, blocking images, fonts, media and trackers, loading pages eagerly and pre-seeding the
+# cookie consent instead of clicking through the banner
+CHROME_LEAN_PROFILE = True
+
+# Configure iso.org backend, 'http' reads country and subdivision pages from fresh http cache entries or a stand-in
+# server without requesting live iso.org, and falls back to chrome for any other page, 'selenium' always renders pages
+# with chrome
+ISO_BACKEND = 'http'
+
+# Configure concurrent geonames page fetches and the connection limit per host
+GEONAMES_WORKERS = 8
+HTTP_MAX_CONNECTIONS_PER_HOST = 8
+
+# Configure http connect and read timeouts in seconds, and the attempts and exponential backoff bounds in seconds used
+# on throttled, failed or timed out requests and page loads
+HTTP_CONNECT_TIMEOUT = 10
+HTTP_READ_TIMEOUT = 60
+RETRY_ATTEMPTS = 4
+RETRY_BASE_DELAY = 1
+RETRY_MAX_DELAY = 30
+
+# Configure http cache folder, size cap and freshness in seconds per host.
+# Offline mode replays cached responses only and never touches the network.
+HTTP_CACHE_FOLDER_PATH = '.cache/http'
+HTTP_CACHE_MAX_BYTES = 512 * 1024 * 1024
+HTTP_CACHE_DEFAULT_TTL = 6 * 60 * 60
+HTTP_CACHE_TTLS = {
+    'www.geonames.org': 7 * 24 * 60 * 60,
+    'download.geonames.org': 24 * 60 * 60,
+    'www.ifcmarkets.com': 24 * 60 * 60,
+    'www.six-group.com': 24 * 60 * 60,
+    'raw.githubusercontent.com': 24 * 60 * 60,
+}
+HTTP_CACHE_OFFLINE = False
+
+# Configure checkpoint store of per country subdivisions, and the age in seconds after which a checkpoint is stale and
+# fetched again when resuming
+CHECKPOINT_PATH = '.cache/checkpoints.sqlite'
+CHECKPOINT_MAX_AGE = 7 * 24 * 60 * 60
+
+# Configure manifest of source response and rendered output hashes, when no source changed since the previous run and
+# every output still matches its recorded hash, merging subdivisions and rendering are skipped. Unchanged subdivision
+# pages are never parsed again, their rows are read back from the checkpoint store
+MANIFEST_PATH = '.cache/manifest.json'
+
+# Configure snapshot of the merged dataset kept between runs, a changelog of the differences with the previous snapshot
+# and suggested replacements_of entries are written to the output folder
+SNAPSHOT_PATH = '.cache/snapshot.json'
+
+# Configure instrumentation, stage events are appended as json lines and metrics are written in the prometheus text
+# format at the end of a run. Stages listed on PROFILE_STAGES are profiled with cProfile into PROFILE_FOLDER_PATH and
+# stages listed on TRACEMALLOC_STAGES record their peak traced memory
+INSTRUMENTATION_EVENTS_PATH = None
+INSTRUMENTATION_PROMETHEUS_PATH = None
+PROFILE_STAGES = ()
+PROFILE_FOLDER_PATH = 'profiles'
+TRACEMALLOC_STAGES = ()
+
+# Configure number of pipeline stages run concurrently, sources that do not depend on each other are fetched together
+SCHEDULER_WORKERS = 8
+
+# Configure number of processes parsing fetched pages in parallel with fetching, 0 parses on the fetching threads
+PARSE_WORKERS = os.cpu_count() or 1
+
+# Configure folder of the partial results written by shard runs and combined by a merge run
+SHARD_FOLDER_PATH = 'shards'
+
 # Configure output folder path
 OUTPUT_FOLDER_PATH = 'output'
 
-iso_fetcher = IsoFetcher(CHROME_DRIVER_PATH)
-geonames_fetcher = GeonamesFetcher()
-crypto_currency_fetcher = CryptoCurrencyFetcher()
+# Configure output formats rendered together in a single pass, any of 'java', 'kotlin', 'json' and 'csv'
+OUTPUT_FORMATS = ('java', 'kotlin', 'json', 'csv')
+
+# Configure file name of the memory-mappable binary index of countries, subdivisions and currencies, None disables it
+DATASET_INDEX_FILE_NAME = 'dataset.idx'
 
 
 def write_file_from_dataclass(entity_name, entities):
-    with open(os.path.join(OUTPUT_FOLDER_PATH, "{0}.txt".format(entity_name)), 'w') as f:
-        f.writelines([entity.to_java_enum() for entity in entities])
+    return MultiFormatWriter(OUTPUT_FOLDER_PATH, OUTPUT_FORMATS).write(entity_name, entities)
 
 
 def write_file_from_lines(lines, file_name):
-    with open(os.path.join(OUTPUT_FOLDER_PATH, "{0}.txt".format(file_name)), 'w') as f:
-        f.writelines(lines)
+    output_file = AtomicFile(os.path.join(OUTPUT_FOLDER_PATH, "{0}.txt".format(file_name)))
+    try:
+        output_file.file.writelines(lines)
+    except BaseException:
+        output_file.abort()
+        raise
+    return {os.path.basename(output_file.path): output_file.commit()}
 
 
 def sort_subdivisions(continent_subdivisions):
@@ -33,15 +129,6 @@ def sort_subdivisions(continent_subdivisions):
     return sort_by_subdivision_level(continent_subdivisions)
 
 
-def get_subdivision_level(country_code, subdivision, subdivisions):
-    if subdivision.parent == country_code:
-        return 1
-    for country_subdivision in subdivisions:
-        if subdivision.parent == country_subdivision.code:
-            return 1 + get_subdivision_level(country_code, country_subdivision, subdivisions)
-    return 0
-
-
 def sort_by_subdivision_level(continent_subdivisions):
     sorted_subdivisions = []
 
@@ -50,89 +137,214 @@ def sort_by_subdivision_level(continent_subdivisions):
         country_subdivisions_map.setdefault(subdivision.country.code, []).append(subdivision)
 
     for country in country_subdivisions_map:
-        subdivisions_by_level = {}
-
-        for subdivision in country_subdivisions_map[country]:
-            subdivisions_by_level.setdefault(
-                get_subdivision_level(country, subdivision, country_subdivisions_map[country]), []).append(subdivision)
-
-        for level in OrderedDict(sorted(subdivisions_by_level.items())):
-            subdivisions_by_level[level].sort(key=lambda subdivision: subdivision.code)
-            sorted_subdivisions.extend(subdivisions_by_level[level])
+        hierarchy = SubdivisionHierarchy(country, country_subdivisions_map[country])
+        if hierarchy.orphans:
+            orphans = [subdivision.code for subdivision in hierarchy.orphans]
+            INSTRUMENTATION.event('hierarchy.orphans', "WARNING: Subdivisions with unknown parent on country {0}: {1}"
+                                  .format(country, orphans), level='warning', country=country, subdivisions=orphans)
+        if hierarchy.cycles:
+            cycles = [subdivision.code for subdivision in hierarchy.cycles]
+            INSTRUMENTATION.event('hierarchy.cycles', "WARNING: Subdivisions with cyclic parents on country {0}: {1}"
+                                  .format(country, cycles), level='warning', country=country, subdivisions=cycles)
+        sorted_subdivisions.extend(hierarchy.sorted())
 
     return sorted_subdivisions
 
 
-if __name__ == '__main__':
-    countries = []
+def get_stage_rows(name, function, *args):
+    with INSTRUMENTATION.stage(name) as stage:
+        rows = function(*args)
+        stage['rows'] = len(rows)
+    return rows
 
-    # Get countries from geonames
-    geonames_country_map = {}
-    for geonames_country in geonames_fetcher.get_countries():
-        geonames_country_map[geonames_country.code] = geonames_country
-
-    # Get countries from iso.org
-    iso_org_country_map = {}
-    for iso_org_country in iso_fetcher.get_countries():
-        # Data repair continent information
-        iso_org_country.continent = geonames_country_map.get(iso_org_country.code).continent
-        countries.append(iso_org_country)
-        iso_org_country_map[iso_org_country.code] = iso_org_country
-
-    # Get subdivisions from iso.org
-    iso_org_continent_subdivisions = {}
-    for country in countries:
-        subdivisions = iso_fetcher.get_subdivisions(country)
-        iso_org_continent_subdivisions.setdefault(country.continent, []).extend(subdivisions)
 
-    # Add countries from geonames that do not exist in iso.org
-    for geonames_country in geonames_country_map:
-        if geonames_country not in iso_org_country_map:
-            countries.append(geonames_country_map[geonames_country])
+def merge_countries(merger, iso_org_countries, geonames_countries):
+    # iso.org countries take precedence, their continent is repaired from geonames and countries from geonames that do
+    # not exist in iso.org are added
+    return merger.merge_countries([('iso.org', iso_org_countries), ('geonames', geonames_countries)],
+                                  repairs=[('geonames', geonames_countries, ('continent',))])
 
-    # Get subdivision from geonames
-    geonames_continent_subdivisions = geonames_fetcher.get_continent_subdivisions(countries)
 
-    # Add subdivisions from geonames that do not exist in iso.org
-    continent_subdivisions = {}
-    for continent in geonames_continent_subdivisions:
-        iso_org_continent_subdivisions_code = [sb.code for sb in iso_org_continent_subdivisions[continent]]
-        for subdivision in geonames_continent_subdivisions[continent]:
-            if subdivision.code not in iso_org_continent_subdivisions_code:
-                continent_subdivisions.setdefault(continent, []).append(subdivision)
+def get_iso_subdivisions(iso_fetcher, iso_org_countries):
+    with INSTRUMENTATION.stage('iso.subdivisions'):
+        iso_org_country_subdivisions = iso_fetcher.get_subdivisions_by_country(iso_org_countries)
+        iso_fetcher.close()
+    return iso_org_country_subdivisions
 
-    # Add all iso.org subdivisions
-    for continent in iso_org_continent_subdivisions:
-        continent_subdivisions.setdefault(continent, []).extend(iso_org_continent_subdivisions[continent])
 
-    # Write subdivisions by continent
+def get_geonames_subdivisions(geonames_subdivision_fetcher, countries):
+    country_subdivisions = {}
+    with INSTRUMENTATION.stage('geonames.subdivisions'):
+        continent_subdivisions = geonames_subdivision_fetcher.get_continent_subdivisions(countries)
     for continent in continent_subdivisions:
-        write_file_from_dataclass(continent, sort_subdivisions(continent_subdivisions[continent]))
+        for subdivision in continent_subdivisions[continent]:
+            country_subdivisions.setdefault(subdivision.country.code, []).append(subdivision)
+    return country_subdivisions
+
+
+def configure_instrumentation():
+    if INSTRUMENTATION_EVENTS_PATH:
+        INSTRUMENTATION.add_sink(JsonLinesSink(INSTRUMENTATION_EVENTS_PATH))
+    if INSTRUMENTATION_PROMETHEUS_PATH:
+        INSTRUMENTATION.add_sink(PrometheusTextSink(INSTRUMENTATION_PROMETHEUS_PATH))
+    INSTRUMENTATION.profile_stages = set(PROFILE_STAGES)
+    INSTRUMENTATION.profile_folder_path = PROFILE_FOLDER_PATH
+    INSTRUMENTATION.tracemalloc_stages = set(TRACEMALLOC_STAGES)
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description='Fetch iso3166-1 and iso3166-2 codes')
+    parser.add_argument('--resume', action='store_true',
+                        help='skip countries whose subdivisions were already fetched on a previous run')
+    parser.add_argument('--refetch', default='',
+                        help='comma separated country codes fetched again when resuming, e.g. failed or stale ones')
+    parser.add_argument('--force', action='store_true',
+                        help='merge and render outputs even if no source changed since the previous run')
+    parser.add_argument('--shard', type=Shard.parse,
+                        help='fetch only the countries of shard I of N, given as I/N, and write a partial result')
+    parser.add_argument('--merge-shards', type=int, metavar='N',
+                        help='merge the partial results of N shards and render the outputs')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    arguments = parse_arguments(argv)
+    configure_instrumentation()
+    checkpoint = CheckpointStore(CHECKPOINT_PATH, arguments.resume,
+                                 [code.strip().upper() for code in arguments.refetch.split(',') if code.strip()],
+                                 CHECKPOINT_MAX_AGE)
+    manifest = Manifest(MANIFEST_PATH)
+    try:
+        with INSTRUMENTATION.stage('run'):
+            if arguments.merge_shards:
+                merger = DatasetMerger()
+                sources, digests = read_shards(SHARD_FOLDER_PATH, arguments.merge_shards)
+                sources['merge.countries'] = merge_countries(merger, sources['iso.countries'],
+                                                             sources['geonames.countries'])
+                render(merger, sources, digests, manifest, arguments.force)
+            else:
+                run(checkpoint, manifest, arguments.force, arguments.shard)
+    finally:
+        PARSE_POOL.close()
+        checkpoint.close()
+        INSTRUMENTATION.close()
+
+
+def run(checkpoint, manifest, force=False, shard=None):
+    retry_policy = RetryPolicy(RETRY_ATTEMPTS, RETRY_BASE_DELAY, RETRY_MAX_DELAY)
+    HTTP_CLIENT.configure(HTTP_MAX_CONNECTIONS_PER_HOST, (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT), retry_policy)
+    PARSE_POOL.configure(PARSE_WORKERS)
+    HTTP_CLIENT.cache = HttpCache(HTTP_CACHE_FOLDER_PATH, HTTP_CACHE_MAX_BYTES, HTTP_CACHE_TTLS,
+                                  HTTP_CACHE_DEFAULT_TTL, HTTP_CACHE_OFFLINE)
+
+    iso_fetcher = IsoFetcher(CHROME_DRIVER_PATH, CHROME_DRIVER_POOL_SIZE, CHROME_DRIVER_MAX_PAGES_PER_SESSION,
+                             CHROME_PAGE_TIMEOUT, CHROME_INTERACTION_TIMEOUT, retry_policy, CHROME_LEAN_PROFILE,
+                             ISO_BACKEND)
+    geonames_fetcher = GeonamesFetcher(GEONAMES_WORKERS)
+    crypto_currency_fetcher = CryptoCurrencyFetcher()
+    iso_fetcher.checkpoint = checkpoint
+    geonames_fetcher.checkpoint = checkpoint
+
+    merger = DatasetMerger()
+    scheduler = StageScheduler(SCHEDULER_WORKERS)
 
-    # Get crypto currencies from ifcmarkets
-    crypto_currencies = sorted(crypto_currency_fetcher.get_crypto_currencies(), key=lambda currencies: currencies.code)
+    # Get countries from geonames
+    scheduler.add('geonames.countries', lambda: get_stage_rows('geonames.countries', geonames_fetcher.get_countries))
 
-    # Write crypto currencies
-    write_file_from_dataclass('crypto_currencies', crypto_currencies)
+    # Get countries from iso.org and merge them with the geonames ones
+    scheduler.add('iso.countries', iso_fetcher.get_countries)
+    scheduler.add('merge.countries', lambda iso_org_countries, geonames_countries: merge_countries(
+        merger, iso_org_countries, geonames_countries), inputs=('iso.countries', 'geonames.countries'))
+
+    # Get subdivisions from iso.org, only of the countries of this shard when sharded
+    scheduler.add('iso.subdivisions', lambda iso_org_countries: get_iso_subdivisions(
+        iso_fetcher, shard.filter(iso_org_countries) if shard else iso_org_countries), inputs=('iso.countries',))
 
-    # Get fiat currencies from iso.org
-    fiat_currencies = iso_fetcher.get_currencies()
+    # Get subdivision from geonames, only of the countries of this shard when sharded
+    scheduler.add('geonames.subdivisions', lambda countries: get_geonames_subdivisions(
+        geonames_fetcher, shard.filter(countries) if shard else countries), inputs=('merge.countries',))
+
+    # Get crypto currencies from ifcmarkets
+    scheduler.add('ifcmarkets.crypto_currencies', lambda: sorted(get_stage_rows(
+        'ifcmarkets.crypto_currencies', crypto_currency_fetcher.get_crypto_currencies),
+        key=lambda currencies: currencies.code))
 
     # Get fiat currencies from geonames
-    country_fiat_currency_map = geonames_fetcher.get_currencies_by_country()
+    scheduler.add('geonames.currencies', lambda: get_stage_rows('geonames.currencies',
+                                                                geonames_fetcher.get_currencies_by_country))
+
+    # Get fiat currencies from iso.org and deprecated ones
+    scheduler.add('iso.currencies', lambda: get_stage_rows('iso.currencies', iso_fetcher.get_currencies))
+    scheduler.add('iso.deprecated_currencies', lambda: get_stage_rows('iso.deprecated_currencies',
+                                                                      iso_fetcher.get_deprecated_currencies))
+
+    # Run independent sources concurrently
+    try:
+        results = scheduler.run()
+    finally:
+        iso_fetcher.close()
+        scheduler.print_critical_path()
+
+    # Write the partial result of this shard, outputs are rendered by a merge run once every shard is done
+    if shard:
+        path = write_shard(SHARD_FOLDER_PATH, shard, results, HTTP_CLIENT.digests)
+        INSTRUMENTATION.event('shard.written', "Wrote partial result of shard {0}/{1} to {2}".format(
+            shard.index, shard.count, path), shard=shard.index, shards=shard.count, path=path)
+        return
+
+    render(merger, results, HTTP_CLIENT.digests, manifest, force)
+
+
+def render(merger, sources, digests, manifest, force=False):
+    countries = sources['merge.countries']
+    iso_org_countries = sources['iso.countries']
+    iso_org_country_subdivisions = sources['iso.subdivisions']
+    crypto_currencies = sources['ifcmarkets.crypto_currencies']
+    country_fiat_currency_map = sources['geonames.currencies']
+    iso_fiat_currencies = sources['iso.currencies']
+    deprecated_fiat_currencies = sources['iso.deprecated_currencies']
+
+    # Skip merging subdivisions and rendering when no source changed since the previous run
+    manifest.set_sources(digests, [RENDER_VERSION, IsoFetcher.PARSER_VERSION, GeonamesFetcher.PARSER_VERSION] +
+                         list(OUTPUT_FORMATS))
+    if not force and manifest.is_up_to_date(OUTPUT_FOLDER_PATH):
+        INSTRUMENTATION.event('manifest.unchanged', "No source changed since the previous run, outputs are up to date")
+        return
+    changed_sources = manifest.changed_sources()
+    INSTRUMENTATION.event('manifest.changed', "{0} sources changed since the previous run".format(
+        len(changed_sources)), sources=changed_sources)
+
+    # Merge subdivisions, iso.org subdivisions take precedence over geonames ones
+    with INSTRUMENTATION.stage('merge.subdivisions'):
+        continent_subdivisions = merger.merge_subdivisions([
+            ('iso.org', [subdivision for country in iso_org_countries
+                         for subdivision in iso_org_country_subdivisions.get(country.code, [])]),
+            ('geonames', [subdivision for country in countries
+                          for subdivision in sources['geonames.subdivisions'].get(country.code, [])]),
+        ])
+
+    # Write subdivisions by continent
+    for continent in continent_subdivisions:
+        with INSTRUMENTATION.stage('write.subdivisions', continent=continent) as stage:
+            manifest.record_outputs(write_file_from_dataclass(continent,
+                                                              sort_subdivisions(continent_subdivisions[continent])))
+            stage['rows'] = len(continent_subdivisions[continent])
 
-    # Filter fiat currencies not used on any country
-    fiat_currencies = {fiat_currency for fiat_currency in fiat_currencies if
-                       fiat_currency.code in country_fiat_currency_map.values()}
+    # Write crypto currencies
+    manifest.record_outputs(write_file_from_dataclass('crypto_currencies', crypto_currencies))
 
-    fiat_currencies.update(iso_fetcher.get_deprecated_currencies())
+    # Merge fiat currencies from iso.org used on any country with deprecated ones
+    fiat_currencies = merger.merge_currencies([
+        ('six-group', iso_fiat_currencies, True),
+        ('currency-codes', deprecated_fiat_currencies, False),
+    ], used_codes=set(country_fiat_currency_map.values()))
 
     # Get all fiat currency iso codes
     fiat_currency_iso_codes = {currency.code for currency in fiat_currencies}
 
     # Write fiat currencies
     fiat_currencies = sorted(fiat_currencies, key=lambda currencies: currencies.code)
-    write_file_from_dataclass('fiat_currencies', fiat_currencies)
+    manifest.record_outputs(write_file_from_dataclass('fiat_currencies', fiat_currencies))
 
     # Add fiat currency on each country
     for country in countries:
@@ -142,7 +354,7 @@ if __name__ == '__main__':
 
     # Write countries
     countries.sort(key=lambda country: country.code)
-    write_file_from_dataclass('countries', countries)
+    manifest.record_outputs(write_file_from_dataclass('countries', countries))
 
     # Get subdivision type by subdivision code
     subdivision_types = {}
@@ -153,4 +365,38 @@ if __name__ == '__main__':
             unique_types.add(subdivision.type.lower())
 
     # Write subdivision type enum
-    write_file_from_lines([to_type_enum(line) for line in sorted(unique_types)], 'subdivision_types_enum')
+    manifest.record_outputs(write_file_from_lines([to_type_enum(line) for line in sorted(unique_types)],
+                                                  'subdivision_types_enum'))
+
+    # Write binary lookup index
+    if DATASET_INDEX_FILE_NAME:
+        with INSTRUMENTATION.stage('write.dataset_index'):
+            manifest.record_outputs({DATASET_INDEX_FILE_NAME: DatasetIndexWriter().write(
+                os.path.join(OUTPUT_FOLDER_PATH, DATASET_INDEX_FILE_NAME), countries,
+                [subdivision for continent in continent_subdivisions
+                 for subdivision in continent_subdivisions[continent]], fiat_currencies, crypto_currencies)})
+
+    # Write changelog against the previous snapshot
+    snapshot = DatasetSnapshot()
+    snapshot.add('countries', countries)
+    snapshot.add('subdivisions', [subdivision for continent in continent_subdivisions
+                                  for subdivision in continent_subdivisions[continent]])
+    snapshot.add('fiat_currencies', fiat_currencies)
+    snapshot.add('crypto_currencies', crypto_currencies)
+    previous_snapshot = DatasetSnapshot.load(SNAPSHOT_PATH)
+    if previous_snapshot is not None:
+        with INSTRUMENTATION.stage('changelog'):
+            changelog = Changelog(previous_snapshot, snapshot)
+            changelog.print_summary()
+            changelog.write(os.path.join(OUTPUT_FOLDER_PATH, 'changelog.json'))
+    snapshot.write(SNAPSHOT_PATH)
+
+    # Write merge report and normalization cache hit rates of this process and the parse workers
+    normalization.report(PARSE_POOL.worker_cache_stats())
+    merger.report.print_summary()
+    merger.report.write(os.path.join(OUTPUT_FOLDER_PATH, 'merge_report.json'))
+    manifest.save()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,3 +1,14 @@
-from random_user_agent.user_agent import UserAgent
+import threading
 
-USER_AGENT = UserAgent(verify_ssl=False)
+_user_agent = None
+_user_agent_lock = threading.Lock()
+
+
+def get_user_agent():
+    global _user_agent
+    if _user_agent is None:
+        with _user_agent_lock:
+            if _user_agent is None:
+                from random_user_agent.user_agent import UserAgent
+                _user_agent = UserAgent(verify_ssl=False)
+    return _user_agent
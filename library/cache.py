@@ -0,0 +1,184 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+from urllib.parse import urlsplit
+
+
+class CacheMiss(Exception):
+    pass
+
+
+class CachedBody:
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+
+    def read(self, size=-1):
+        chunk = self.file.read(size)
+        if not chunk:
+            self.file.close()
+        return chunk
+
+    def close(self):
+        self.file.close()
+
+
+class HttpCache:
+    CHUNK_SIZE = 1 << 16
+
+    def __init__(self, folder_path, max_bytes=512 * 1024 * 1024, ttls=None, default_ttl=0, offline=False):
+        self.folder_path = folder_path
+        self.max_bytes = max_bytes
+        self.ttls = ttls or {}
+        self.default_ttl = default_ttl
+        self.offline = offline
+        self.__lock = threading.Lock()
+        self.__entries = {}
+        self.__size = 0
+        os.makedirs(folder_path, exist_ok=True)
+        self.__load()
+
+    def get(self, url, fetch, revalidate=False):
+        key = self.__key(url)
+        with self.__lock:
+            entry = self.__entries.get(key)
+
+        if entry and self.__is_fresh(url, entry) and (self.offline or not revalidate):
+            return self.__hit(key, entry)
+        if self.offline:
+            raise CacheMiss("No cached response for {0}".format(url))
+
+        headers = {}
+        if entry and entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry and entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+
+        response = fetch(headers)
+        if entry and response.status_code == 304:
+            entry['stored_at'] = time.time()
+            return self.__hit(key, entry)
+        if response.status_code != 200:
+            return response
+        if response._content_consumed:
+            self.__store(key, url, [response.content], response.headers, response.encoding)
+            return response
+        # Streamed bodies are copied to disk chunk by chunk and served back from the stored file
+        entry = self.__store(key, url, response.iter_content(self.CHUNK_SIZE), response.headers, response.encoding)
+        return self.__hit(key, entry)
+
+    def lookup(self, url):
+        key = self.__key(url)
+        with self.__lock:
+            entry = self.__entries.get(key)
+        if entry and self.__is_fresh(url, entry):
+            return self.__hit(key, entry)
+        return None
+
+    def put(self, url, content, content_type):
+        key = self.__key(url)
+        self.__store(key, url, [content], {'Content-Type': content_type}, None)
+
+    def urls(self):
+        with self.__lock:
+            return [entry['url'] for entry in self.__entries.values()]
+
+    def __ttl(self, url):
+        return self.ttls.get(urlsplit(url).netloc, self.default_ttl)
+
+    def __is_fresh(self, url, entry):
+        return self.offline or time.time() - entry['stored_at'] < self.__ttl(url)
+
+    def __hit(self, key, entry):
+        from requests import Response
+        from requests.structures import CaseInsensitiveDict
+
+        entry['last_access'] = time.time()
+        self.__write_meta(key, entry)
+        response = Response()
+        response.status_code = 200
+        response.url = entry['url']
+        response.encoding = entry.get('encoding')
+        response.headers = CaseInsensitiveDict(entry.get('headers', {}))
+        response.raw = CachedBody(self.__body_path(key))
+        return response
+
+    def __store(self, key, url, chunks, headers, encoding):
+        size = self.__write_atomic(self.__body_path(key), chunks)
+        now = time.time()
+        entry = {
+            'url': url,
+            'etag': headers.get('ETag'),
+            'last_modified': headers.get('Last-Modified'),
+            'encoding': encoding,
+            'headers': {name: value for name, value in headers.items() if name.lower() == 'content-type'},
+            'size': size,
+            'stored_at': now,
+            'last_access': now,
+        }
+        self.__write_meta(key, entry)
+        with self.__lock:
+            previous = self.__entries.get(key)
+            self.__size += entry['size'] - (previous['size'] if previous else 0)
+            self.__entries[key] = entry
+            self.__evict(keep=key)
+        return entry
+
+    def __evict(self, keep):
+        if self.__size <= self.max_bytes:
+            return
+        for key, entry in sorted(self.__entries.items(), key=lambda item: item[1]['last_access']):
+            if self.__size <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            for path in (self.__body_path(key), self.__meta_path(key)):
+                if os.path.exists(path):
+                    os.remove(path)
+            self.__size -= entry['size']
+            del self.__entries[key]
+
+    def __load(self):
+        for file_name in os.listdir(self.folder_path):
+            if not file_name.endswith('.json'):
+                continue
+            key = file_name[:-len('.json')]
+            try:
+                with open(self.__meta_path(key)) as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if os.path.exists(self.__body_path(key)):
+                self.__entries[key] = entry
+                self.__size += entry['size']
+
+    def __write_meta(self, key, entry):
+        self.__write_atomic(self.__meta_path(key), [json.dumps(entry).encode('utf-8')])
+
+    @staticmethod
+    def __write_atomic(path, chunks):
+        size = 0
+        temporary_path = '{0}.{1}.tmp'.format(path, threading.get_ident())
+        try:
+            with open(temporary_path, 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    size += len(chunk)
+        except BaseException:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+            raise
+        os.replace(temporary_path, path)
+        return size
+
+    def __body_path(self, key):
+        return os.path.join(self.folder_path, '{0}.body'.format(key))
+
+    def __meta_path(self, key):
+        return os.path.join(self.folder_path, '{0}.json'.format(key))
+
+    @staticmethod
+    def __key(url):
+        return hashlib.sha256(url.encode('utf-8')).hexdigest()
@@ -0,0 +1,108 @@
+import json
+import os
+
+from .emitter import AtomicFile
+from .instrumentation import INSTRUMENTATION
+from .model import replacements_of
+
+
+class DatasetSnapshot:
+    KINDS = ('countries', 'subdivisions', 'fiat_currencies', 'crypto_currencies')
+
+    def __init__(self, indexes=None):
+        self.indexes = {kind: {} for kind in self.KINDS}
+        self.indexes.update(indexes or {})
+
+    def add(self, kind, entities):
+        index = self.indexes[kind]
+        for entity in entities:
+            index[entity.code] = entity.to_record()
+
+    @staticmethod
+    def load(path):
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding='utf-8') as f:
+            return DatasetSnapshot(json.load(f))
+
+    def write(self, path):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary_path = '{0}.tmp'.format(path)
+        with open(temporary_path, 'w', encoding='utf-8') as f:
+            json.dump(self.indexes, f, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+        os.replace(temporary_path, path)
+
+
+class Changelog:
+    FIELDS = {
+        'countries': ('name', 'continent', 'currency'),
+        'subdivisions': ('name', 'type', 'parent', 'country'),
+        'fiat_currencies': ('name', 'symbol', 'test'),
+        'crypto_currencies': ('name', 'symbol', 'test'),
+    }
+    SUBDIVISION_CHANGES = {'name': 'renamed', 'type': 'retyped', 'parent': 'reparented', 'country': 'moved'}
+
+    def __init__(self, previous, current):
+        self.changes = {}
+        for kind in DatasetSnapshot.KINDS:
+            self.changes[kind] = self.__diff(kind, previous.indexes[kind], current.indexes[kind])
+        self.suggested_replacements = self.__suggest_replacements(self.changes['subdivisions'])
+
+    def to_dict(self):
+        return dict(self.changes, suggested_replacements=self.suggested_replacements)
+
+    def write(self, path):
+        output_file = AtomicFile(path)
+        try:
+            json.dump(self.to_dict(), output_file.file, indent=2, ensure_ascii=False)
+        except BaseException:
+            output_file.abort()
+            raise
+        return output_file.commit()
+
+    def print_summary(self):
+        for kind, kind_changes in self.changes.items():
+            counts = ["{0} {1}".format(len(changes), change) for change, changes in kind_changes.items() if changes]
+            if counts:
+                INSTRUMENTATION.event('changelog.changes', "Changed {0}: {1}".format(kind, ", ".join(counts)),
+                                      kind=kind, **{change: len(changes) for change, changes in kind_changes.items()})
+        for replaced_code, replacement_code in sorted(self.suggested_replacements.items()):
+            INSTRUMENTATION.event('changelog.replacement', "Suggested replacement: \"{0}\": \"{1}\",".format(
+                replaced_code, replacement_code), replaced=replaced_code, replacement=replacement_code)
+
+    def __diff(self, kind, previous, current):
+        changes = {'added': [record for code, record in current.items() if code not in previous],
+                   'removed': [record for code, record in previous.items() if code not in current]}
+        if kind == 'subdivisions':
+            for change in self.SUBDIVISION_CHANGES.values():
+                changes[change] = []
+        else:
+            changes['changed'] = []
+
+        for code, record in current.items():
+            previous_record = previous.get(code)
+            if previous_record is None:
+                continue
+            for field in self.FIELDS[kind]:
+                previous_value = previous_record.get(field)
+                value = record.get(field)
+                if previous_value != value:
+                    change = self.SUBDIVISION_CHANGES[field] if kind == 'subdivisions' else 'changed'
+                    changes[change].append({'code': code, 'field': field, 'previous': previous_value,
+                                            'current': value})
+        return changes
+
+    @staticmethod
+    def __suggest_replacements(subdivision_changes):
+        added_by_name = {}
+        for record in subdivision_changes['added']:
+            added_by_name.setdefault((record['country'], record['name'].casefold()), []).append(record['code'])
+
+        suggestions = {}
+        for record in subdivision_changes['removed']:
+            replaced_code = record['code'].replace('-', '_')
+            replacement_codes = added_by_name.get((record['country'], record['name'].casefold()), [])
+            if replaced_code not in replacements_of and len(replacement_codes) == 1:
+                suggestions[replaced_code] = replacement_codes[0]
+        return suggestions
@@ -0,0 +1,58 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from .model import SubdivisionWithParentEnum
+
+
+class CheckpointStore:
+    def __init__(self, path, resume=False, refetch=(), max_age=None):
+        self.path = path
+        self.resume = resume
+        self.refetch = set(refetch)
+        self.max_age = max_age
+        self.__lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.__connection = sqlite3.connect(path, check_same_thread=False)
+        self.__connection.execute('PRAGMA journal_mode=WAL')
+        self.__connection.execute('CREATE TABLE IF NOT EXISTS subdivisions (source TEXT NOT NULL, '
+                                  'country TEXT NOT NULL, stored_at REAL NOT NULL, payload TEXT NOT NULL, '
+                                  'digest TEXT, PRIMARY KEY (source, country))')
+        columns = [row[1] for row in self.__connection.execute('PRAGMA table_info(subdivisions)')]
+        if 'digest' not in columns:
+            self.__connection.execute('ALTER TABLE subdivisions ADD COLUMN digest TEXT')
+        self.__connection.commit()
+
+    def is_refetched(self, country):
+        return country.code in self.refetch
+
+    def load_subdivisions(self, source, country, digest=None):
+        # Refetched countries never reuse a stored result, not even one whose source digest is unchanged
+        if self.is_refetched(country) or digest is None and not self.resume:
+            return None
+        with self.__lock:
+            row = self.__connection.execute('SELECT stored_at, payload, digest FROM subdivisions '
+                                            'WHERE source = ? AND country = ?', (source, country.code)).fetchone()
+        if row is None:
+            return None
+        if digest is not None and row[2] != digest:
+            return None
+        if digest is None and self.max_age and time.time() - row[0] > self.max_age:
+            return None
+        return [SubdivisionWithParentEnum(code, name, type, parent, country)
+                for code, name, type, parent in json.loads(row[1])]
+
+    def save_subdivisions(self, source, country, subdivisions, digest=None):
+        payload = json.dumps([[subdivision.code, subdivision.name, subdivision.type, subdivision.parent]
+                              for subdivision in subdivisions], ensure_ascii=False, separators=(',', ':'))
+        with self.__lock:
+            self.__connection.execute('INSERT OR REPLACE INTO subdivisions VALUES (?, ?, ?, ?, ?)',
+                                      (source, country.code, time.time(), payload, digest))
+            self.__connection.commit()
+
+    def close(self):
+        with self.__lock:
+            self.__connection.close()
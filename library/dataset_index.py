@@ -0,0 +1,233 @@
+import mmap
+import struct
+
+from .emitter import AtomicFile
+
+MAGIC = b'ISO3166I'
+VERSION = 1
+NONE = 0xFFFFFFFF
+
+HEADER = struct.Struct('<8sI')
+SECTION = struct.Struct('<QI')
+STRING_LENGTH = struct.Struct('<H')
+COUNTRY = struct.Struct('<6I')
+SUBDIVISION = struct.Struct('<8I')
+CURRENCY = struct.Struct('<4I')
+NAME = struct.Struct('<2I')
+CHILD = struct.Struct('<I')
+
+SECTIONS = ('strings', 'countries', 'country_names', 'subdivisions', 'subdivision_names', 'children',
+            'fiat_currencies', 'fiat_currency_names', 'crypto_currencies', 'crypto_currency_names')
+NAME_SECTIONS = {
+    'countries': 'country_names',
+    'subdivisions': 'subdivision_names',
+    'fiat_currencies': 'fiat_currency_names',
+    'crypto_currencies': 'crypto_currency_names',
+}
+
+
+class DatasetIndexWriter:
+    def __init__(self):
+        self.strings = bytearray()
+        self.string_offsets = {}
+
+    def write(self, path, countries, subdivisions, fiat_currencies, crypto_currencies):
+        self.strings = bytearray()
+        self.string_offsets = {}
+        countries = sorted(countries, key=lambda country: country.code)
+        subdivisions = sorted(subdivisions, key=lambda subdivision: subdivision.code)
+        country_indexes = {country.code: index for index, country in enumerate(countries)}
+        subdivision_indexes = {subdivision.code: index for index, subdivision in enumerate(subdivisions)}
+
+        country_children = [[] for _ in countries]
+        subdivision_children = [[] for _ in subdivisions]
+        for index, subdivision in enumerate(subdivisions):
+            parent_index = subdivision_indexes.get(subdivision.parent)
+            if parent_index is not None and parent_index != index:
+                subdivision_children[parent_index].append(index)
+            elif subdivision.country.code in country_indexes:
+                country_children[country_indexes[subdivision.country.code]].append(index)
+
+        children = []
+        country_records = []
+        for country, country_child_indexes in zip(countries, country_children):
+            country_records.append(COUNTRY.pack(self.__string(country.code), self.__string(country.name),
+                                                self.__string(country.continent), self.__string(country.currency),
+                                                len(children), len(country_child_indexes)))
+            children.extend(country_child_indexes)
+        subdivision_records = []
+        for subdivision, subdivision_child_indexes in zip(subdivisions, subdivision_children):
+            subdivision_records.append(SUBDIVISION.pack(
+                self.__string(subdivision.code), self.__string(subdivision.name), self.__string(subdivision.type),
+                self.__string(subdivision.parent), country_indexes.get(subdivision.country.code, NONE),
+                subdivision_indexes.get(subdivision.parent, NONE), len(children), len(subdivision_child_indexes)))
+            children.extend(subdivision_child_indexes)
+
+        sections = {
+            'countries': country_records,
+            NAME_SECTIONS['countries']: self.__names(countries),
+            'subdivisions': subdivision_records,
+            NAME_SECTIONS['subdivisions']: self.__names(subdivisions),
+            'children': [CHILD.pack(index) for index in children],
+        }
+        for kind, currencies in (('fiat_currencies', fiat_currencies), ('crypto_currencies', crypto_currencies)):
+            currencies = sorted(currencies, key=lambda currency: currency.code)
+            sections[kind] = [CURRENCY.pack(self.__string(currency.code), self.__string(currency.name),
+                                            self.__string(currency.symbol), int(currency.test))
+                              for currency in currencies]
+            sections[NAME_SECTIONS[kind]] = self.__names(currencies)
+
+        output_file = AtomicFile(path, binary=True)
+        try:
+            offset = HEADER.size + SECTION.size * len(SECTIONS)
+            directory = []
+            for name in SECTIONS:
+                if name == 'strings':
+                    count = size = len(self.strings)
+                else:
+                    count, size = len(sections[name]), sum(len(record) for record in sections[name])
+                directory.append(SECTION.pack(offset, count))
+                offset += size
+            output_file.file.write(HEADER.pack(MAGIC, VERSION))
+            output_file.file.writelines(directory)
+            output_file.file.write(self.strings)
+            for name in SECTIONS[1:]:
+                output_file.file.writelines(sections[name])
+        except BaseException:
+            output_file.abort()
+            raise
+        return output_file.commit()
+
+    def __names(self, entities):
+        names = sorted((entity.name.casefold(), index) for index, entity in enumerate(entities))
+        return [NAME.pack(self.__string(name), index) for name, index in names]
+
+    def __string(self, value):
+        value = value or ''
+        offset = self.string_offsets.get(value)
+        if offset is None:
+            content = value.encode('utf-8')
+            offset = len(self.strings)
+            self.strings += STRING_LENGTH.pack(len(content))
+            self.strings += content
+            self.string_offsets[value] = offset
+        return offset
+
+
+class DatasetIndex:
+    def __init__(self, path):
+        self.path = path
+        self.__file = open(path, 'rb')
+        self.__buffer = mmap.mmap(self.__file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version = HEADER.unpack_from(self.__buffer, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError("{0} is not a version {1} dataset index".format(path, VERSION))
+        self.__sections = {name: SECTION.unpack_from(self.__buffer, HEADER.size + index * SECTION.size)
+                           for index, name in enumerate(SECTIONS)}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if not self.__buffer.closed:
+            self.__buffer.close()
+        self.__file.close()
+
+    def count(self, kind):
+        return self.__sections[kind][1]
+
+    def country(self, code):
+        index = self.__find('countries', COUNTRY, code)
+        return None if index is None else self.__country(index)
+
+    def subdivision(self, code):
+        index = self.__find('subdivisions', SUBDIVISION, code)
+        return None if index is None else self.__subdivision(index)
+
+    def currency(self, code):
+        for kind in ('fiat_currencies', 'crypto_currencies'):
+            index = self.__find(kind, CURRENCY, code)
+            if index is not None:
+                return self.__currency(kind, index)
+        return None
+
+    def children(self, code):
+        index = self.__find('subdivisions', SUBDIVISION, code)
+        if index is not None:
+            start, count = self.__record('subdivisions', SUBDIVISION, index)[6:8]
+        else:
+            index = self.__find('countries', COUNTRY, code)
+            if index is None:
+                return []
+            start, count = self.__record('countries', COUNTRY, index)[4:6]
+        offset = self.__sections['children'][0]
+        return [self.__subdivision(CHILD.unpack_from(self.__buffer, offset + (start + position) * CHILD.size)[0])
+                for position in range(count)]
+
+    def search(self, prefix, kind='subdivisions', limit=None):
+        prefix = prefix.casefold()
+        offset, count = self.__sections[NAME_SECTIONS[kind]]
+        low, high = 0, count
+        while low < high:
+            middle = (low + high) // 2
+            if self.__string(NAME.unpack_from(self.__buffer, offset + middle * NAME.size)[0]) < prefix:
+                low = middle + 1
+            else:
+                high = middle
+
+        results = []
+        for position in range(low, count):
+            if limit is not None and len(results) >= limit:
+                break
+            name_offset, index = NAME.unpack_from(self.__buffer, offset + position * NAME.size)
+            if not self.__string(name_offset).startswith(prefix):
+                break
+            if kind == 'countries':
+                results.append(self.__country(index))
+            elif kind == 'subdivisions':
+                results.append(self.__subdivision(index))
+            else:
+                results.append(self.__currency(kind, index))
+        return results
+
+    def __country(self, index):
+        code, name, continent, currency = self.__record('countries', COUNTRY, index)[:4]
+        return {'code': self.__string(code), 'name': self.__string(name), 'continent': self.__string(continent),
+                'currency': self.__string(currency)}
+
+    def __subdivision(self, index):
+        code, name, type, parent, country = self.__record('subdivisions', SUBDIVISION, index)[:5]
+        country_code = self.__string(self.__record('countries', COUNTRY, country)[0]) if country != NONE else None
+        return {'code': self.__string(code), 'name': self.__string(name), 'type': self.__string(type),
+                'parent': self.__string(parent), 'country': country_code}
+
+    def __currency(self, kind, index):
+        code, name, symbol, test = self.__record(kind, CURRENCY, index)
+        return {'code': self.__string(code), 'name': self.__string(name), 'symbol': self.__string(symbol),
+                'test': bool(test)}
+
+    def __find(self, kind, record, code):
+        offset, count = self.__sections[kind]
+        low, high = 0, count
+        while low < high:
+            middle = (low + high) // 2
+            middle_code = self.__string(record.unpack_from(self.__buffer, offset + middle * record.size)[0])
+            if middle_code < code:
+                low = middle + 1
+            elif middle_code > code:
+                high = middle
+            else:
+                return middle
+        return None
+
+    def __record(self, kind, record, index):
+        return record.unpack_from(self.__buffer, self.__sections[kind][0] + index * record.size)
+
+    def __string(self, offset):
+        start = self.__sections['strings'][0] + offset
+        length = STRING_LENGTH.unpack_from(self.__buffer, start)[0]
+        return self.__buffer[start + STRING_LENGTH.size:start + STRING_LENGTH.size + length].decode('utf-8')
@@ -0,0 +1,124 @@
+import queue
+import threading
+import time
+
+from .instrumentation import INSTRUMENTATION
+from contextlib import contextmanager
+
+
+class WebDriverSession:
+    def __init__(self, index, driver):
+        self.index = index
+        self.driver = driver
+        self.pages = 0
+        self.latency = 0.0
+
+
+class WebDriverPool:
+    def __init__(self, driver_path, options, size=1, max_pages=50, setup=None):
+        self.driver_path = driver_path
+        self.options = options
+        self.setup = setup
+        self.size = max(1, size)
+        self.max_pages = max_pages
+        self.__idle = queue.Queue()
+        self.__slots = threading.BoundedSemaphore(self.size)
+        self.__lock = threading.Lock()
+        self.__created = 0
+        self.__stats = {}
+
+    @contextmanager
+    def session(self):
+        session = self.__acquire()
+        started = time.monotonic()
+        try:
+            yield session.driver
+        except Exception:
+            self.__record(session, started)
+            if self.__is_alive(session):
+                self.__release(session)
+            else:
+                INSTRUMENTATION.event('browser.recycle', "Recycling crashed browser session {0}".format(
+                    session.index), level='warning', session=session.index)
+                self.__discard(session)
+            raise
+        self.__record(session, started)
+        self.__release(session)
+
+    def stats(self):
+        with self.__lock:
+            return [dict(stats, session=index) for index, stats in sorted(self.__stats.items())]
+
+    def report(self):
+        for stats in self.stats():
+            average = stats['latency'] / stats['pages'] if stats['pages'] else 0
+            message = "Browser session {0}: {1} pages, {2:.2f}s total, {3:.2f}s per page".format(
+                stats['session'], stats['pages'], stats['latency'], average)
+            INSTRUMENTATION.event('browser.session', message, **stats)
+
+    def close(self):
+        while True:
+            try:
+                session = self.__idle.get_nowait()
+            except queue.Empty:
+                break
+            self.__discard(session, release=False)
+
+    def __acquire(self):
+        from selenium import webdriver
+
+        self.__slots.acquire()
+        try:
+            return self.__idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self.__lock:
+            self.__created += 1
+            index = self.__created
+        try:
+            driver = webdriver.Chrome(self.driver_path, options=self.options)
+        except Exception:
+            self.__slots.release()
+            raise
+        session = WebDriverSession(index, driver)
+        if self.setup:
+            try:
+                self.setup(driver)
+            except Exception:
+                self.__discard(session)
+                raise
+        return session
+
+    def __release(self, session):
+        if self.max_pages and session.pages >= self.max_pages:
+            self.__discard(session)
+        else:
+            self.__idle.put(session)
+            self.__slots.release()
+
+    def __discard(self, session, release=True):
+        try:
+            session.driver.quit()
+        except Exception:
+            pass
+        if release:
+            self.__slots.release()
+
+    def __record(self, session, started):
+        elapsed = time.monotonic() - started
+        session.pages += 1
+        session.latency += elapsed
+        INSTRUMENTATION.count('browser_pages_total', 1, session=session.index)
+        INSTRUMENTATION.count('browser_page_seconds_total', elapsed, session=session.index)
+        with self.__lock:
+            stats = self.__stats.setdefault(session.index, {'pages': 0, 'latency': 0.0})
+            stats['pages'] += 1
+            stats['latency'] += elapsed
+
+    @staticmethod
+    def __is_alive(session):
+        try:
+            session.driver.current_url
+            return True
+        except Exception:
+            return False
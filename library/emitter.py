@@ -0,0 +1,128 @@
+import csv
+import filecmp
+import json
+import os
+
+from .manifest import get_file_digest
+
+# Bump whenever merging or rendering changes the outputs written from unchanged sources
+RENDER_VERSION = 1
+
+
+class AtomicFile:
+    BUFFER_SIZE = 1 << 16
+
+    def __init__(self, path, binary=False):
+        self.path = path
+        self.temporary_path = '{0}.tmp'.format(path)
+        if binary:
+            self.file = open(self.temporary_path, 'wb', buffering=self.BUFFER_SIZE)
+        else:
+            self.file = open(self.temporary_path, 'w', buffering=self.BUFFER_SIZE, encoding='utf-8', newline='')
+
+    def commit(self):
+        self.file.close()
+        digest = get_file_digest(self.temporary_path)
+        if os.path.exists(self.path) and filecmp.cmp(self.temporary_path, self.path, shallow=False):
+            os.remove(self.temporary_path)
+        else:
+            os.replace(self.temporary_path, self.path)
+        return digest
+
+    def abort(self):
+        self.file.close()
+        if os.path.exists(self.temporary_path):
+            os.remove(self.temporary_path)
+
+
+class JavaEnumEmitter:
+    extension = 'txt'
+
+    def __init__(self, file):
+        self.file = file
+
+    def write(self, entity, java_enum):
+        self.file.write(java_enum)
+
+    def close(self):
+        pass
+
+
+class KotlinEnumEmitter(JavaEnumEmitter):
+    extension = 'kt'
+
+    def write(self, entity, java_enum):
+        self.file.write(java_enum.replace('$', '\\$'))
+
+
+class JsonEmitter:
+    extension = 'json'
+
+    def __init__(self, file):
+        self.file = file
+        self.file.write('[')
+        self.separator = '\n'
+
+    def write(self, entity, java_enum):
+        self.file.write(self.separator)
+        self.file.write(json.dumps(entity.to_record(), ensure_ascii=False))
+        self.separator = ',\n'
+
+    def close(self):
+        self.file.write('\n]\n')
+
+
+class CsvEmitter:
+    extension = 'csv'
+
+    def __init__(self, file):
+        self.file = file
+        self.writer = None
+
+    def write(self, entity, java_enum):
+        record = entity.to_record()
+        if self.writer is None:
+            self.writer = csv.DictWriter(self.file, fieldnames=list(record))
+            self.writer.writeheader()
+        self.writer.writerow({key: ' '.join(value) if isinstance(value, list) else value
+                              for key, value in record.items()})
+
+    def close(self):
+        pass
+
+
+EMITTERS = {
+    'java': JavaEnumEmitter,
+    'kotlin': KotlinEnumEmitter,
+    'json': JsonEmitter,
+    'csv': CsvEmitter,
+}
+
+
+class MultiFormatWriter:
+    def __init__(self, folder_path, formats=('java',)):
+        self.folder_path = folder_path
+        self.emitter_types = [EMITTERS[output_format] for output_format in formats]
+
+    def write(self, entity_name, entities):
+        files = []
+        digests = {}
+        try:
+            emitters = []
+            for emitter_type in self.emitter_types:
+                files.append(AtomicFile(os.path.join(self.folder_path, '{0}.{1}'.format(entity_name,
+                                                                                        emitter_type.extension))))
+                emitters.append(emitter_type(files[-1].file))
+            for entity in entities:
+                java_enum = entity.to_java_enum()
+                for emitter in emitters:
+                    emitter.write(entity, java_enum)
+            for emitter in emitters:
+                emitter.close()
+        except BaseException:
+            for file in files:
+                file.abort()
+            raise
+        for file in files:
+            digests[os.path.basename(file.path)] = file.commit()
+        return digests
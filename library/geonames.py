@@ -1,11 +1,14 @@
 import csv
-import requests
-import re
 
-from . import USER_AGENT
+from .http import HTTP_CLIENT
+from .instrumentation import INSTRUMENTATION
+from .manifest import get_digest
 from .model import CountryEnum, SubdivisionWithParentEnum
+from .normalization import clean_region_name, clean_type, invert_aliases
+from .parse_pool import PARSE_POOL
+from .tables import extract_table_rows, get_table_rows, parse_tables
 
-from bs4 import BeautifulSoup
+from concurrent.futures import ThreadPoolExecutor
 
 
 class GeonamesFetcher:
@@ -17,15 +20,29 @@ class GeonamesFetcher:
         "province": ["provincia"],
     }
 
+    TYPE_ALIASES = invert_aliases(SubdivisionTypeAlias)
+
     CountyContinentAlias = {
         "CX": "C_AS",
         "TL": "C_AS"
     }
 
+    SUBDIVISION_TABLES = ['subdivtable1', 'subdivtable2', 'subdivtable3']
+
     CurrencyAlias = {
         "SLL": "SLE"
     }
 
+    CHECKPOINT_SOURCE = 'geonames'
+
+    # Bump whenever parsing or normalization changes the rows read out of an unchanged page
+    PARSER_VERSION = 1
+
+    checkpoint = None
+
+    def __init__(self, workers=1):
+        self.workers = workers
+
     def get_currencies_by_country(self):
         country_currency_map = {}
         response = self.__get_response(self.CURRENCIES_URL)
@@ -41,104 +58,108 @@ class GeonamesFetcher:
 
     def get_countries(self):
         countries = []
-        rows = self.__get_html(self.COUNTRIES_URL).find("table", id='countries').find_all("tr")
-        for row in rows:
-            cells = row.find_all("td")
-            if cells:
-                country_code = cells[0].get_text().strip()
-                country_name = cells[4].get_text().strip()
-                if country_code in self.CountyContinentAlias:
-                    continent_code = self.CountyContinentAlias[country_code]
-                else:
-                    continent_code = 'C_{0}'.format(cells[8].get_text().strip())
-                countries.append(CountryEnum(country_code, country_name, continent_code, ''))
+        for cells in extract_table_rows(self.__get_content(self.COUNTRIES_URL), id='countries'):
+            country_code = cells[0].strip()
+            country_name = cells[4].strip()
+            if country_code in self.CountyContinentAlias:
+                continent_code = self.CountyContinentAlias[country_code]
+            else:
+                continent_code = 'C_{0}'.format(cells[8].strip())
+            countries.append(CountryEnum(country_code, country_name, continent_code, ''))
         return countries
 
     def get_continent_subdivisions(self, countries):
         subdivisions = {}
-        for country in countries:
-            print("Getting subdivisions for country {0}".format(country.code))
-            subdivisions.setdefault(country.continent, []).extend(self.get_country_subdivision(country))
+        with ThreadPoolExecutor(max_workers=max(1, self.workers)) as executor:
+            for country, country_subdivisions in zip(countries, executor.map(self.__get_country_subdivision,
+                                                                             countries)):
+                subdivisions.setdefault(country.continent, []).extend(country_subdivisions)
+        return subdivisions
+
+    def __get_country_subdivision(self, country):
+        if self.checkpoint:
+            subdivisions = self.checkpoint.load_subdivisions(self.CHECKPOINT_SOURCE, country)
+            if subdivisions is not None:
+                INSTRUMENTATION.event('geonames.subdivisions', "Resuming subdivisions for country {0}".format(
+                    country.code), country=country.code, resumed=True)
+                return subdivisions
+
+        INSTRUMENTATION.event('geonames.subdivisions', "Getting subdivisions for country {0}".format(country.code),
+                              country=country.code)
+        content = self.__fetch_subdivisions(country)
+        digest = get_digest(content, self.PARSER_VERSION)
+        if self.checkpoint:
+            subdivisions = self.checkpoint.load_subdivisions(self.CHECKPOINT_SOURCE, country, digest)
+            if subdivisions is not None:
+                INSTRUMENTATION.event('geonames.subdivisions', country=country.code, unchanged=True)
+                return subdivisions
+
+        subdivisions = self.__parse_subdivisions(country, content)
+        if self.checkpoint:
+            self.checkpoint.save_subdivisions(self.CHECKPOINT_SOURCE, country, subdivisions, digest)
         return subdivisions
 
     def get_country_subdivision(self, country):
-        subdivisions = []
+        return self.__parse_subdivisions(country, self.__fetch_subdivisions(country))
+
+    def __fetch_subdivisions(self, country):
         subdivision_url = 'https://www.geonames.org/{0}/administrative-division-{1}.html'.format(country.code,
                                                                                                  country.name.lower())
-        html_content = self.__get_html(subdivision_url)
+        # Refetched countries revalidate their cached page instead of reading it while it is still fresh
+        revalidate = bool(self.checkpoint and self.checkpoint.is_refetched(country))
+        with INSTRUMENTATION.stage('geonames.fetch_subdivisions', country=country.code) as stage:
+            content = self.__get_content(subdivision_url, revalidate)
+            stage['bytes'] = len(content)
+        return content
+
+    def __parse_subdivisions(self, country, content):
+        with INSTRUMENTATION.stage('geonames.parse_subdivisions', country=country.code) as stage:
+            rows, has_subdivision3 = PARSE_POOL.parse(GeonamesFetcher.parse_subdivisions, country.code, content)
+            subdivisions = [SubdivisionWithParentEnum(code, name, type, parent, country)
+                            for code, name, type, parent in rows]
+            stage['rows'] = len(subdivisions)
+        # Parsing runs in worker processes without the configured sinks, so its warnings are emitted here
+        if has_subdivision3:
+            INSTRUMENTATION.event('geonames.subdivtable3',
+                                  "WARNING: More subdivision were found on subdivtable3. {0}".format(country.code),
+                                  level='warning', country=country.code)
+        return subdivisions
 
-        subdivision1_rows = html_content.find("table", id='subdivtable1')
-        if subdivision1_rows:
-            for row in subdivision1_rows.find_all("tr"):
-                cells = row.find_all("td")
-                if cells and len(cells) > 10 and not cells[11].get_text() and cells[1].get_text().strip():
-                    subdivisions.append(
-                        self.__create_subdivision_enum(cells[1].get_text().strip(), cells[4].get_text().strip(),
-                                                       cells[5].get_text().strip(), country))
-
-        subdivision2_rows = html_content.find("table", id='subdivtable2')
-        if subdivision2_rows:
-            for row in subdivision2_rows.find_all("tr"):
-                cells = row.find_all("td")
-                if cells and len(cells) > 11 and not cells[12].get_text() and cells[1].get_text().strip():
-                    subdivisions.append(
-                        self.__create_subdivision_enum(cells[1].get_text().strip(), cells[5].get_text().strip(),
-                                                       cells[6].get_text().strip(), country))
+    @staticmethod
+    def parse_subdivisions(country_code, content):
+        subdivisions = []
+        html_content = parse_tables(content, id=GeonamesFetcher.SUBDIVISION_TABLES)
 
-        subdivision3_rows = html_content.find("table", id='subdivtable3')
-        if subdivision3_rows:
-            print("WARNING: More subdivision were found on subdivtable3. {0}".format(country))
+        subdivision1_rows = get_table_rows(html_content.find("table", id='subdivtable1'))
+        if subdivision1_rows:
+            for cells in subdivision1_rows:
+                if len(cells) > 10 and not cells[11] and cells[1].strip():
+                    subdivisions.append(GeonamesFetcher.__create_subdivision_row(
+                        cells[1].strip(), cells[4].strip(), cells[5].strip(), country_code))
 
-        return subdivisions
+        subdivision2_rows = get_table_rows(html_content.find("table", id='subdivtable2'))
+        if subdivision2_rows:
+            for cells in subdivision2_rows:
+                if len(cells) > 11 and not cells[12] and cells[1].strip():
+                    subdivisions.append(GeonamesFetcher.__create_subdivision_row(
+                        cells[1].strip(), cells[5].strip(), cells[6].strip(), country_code))
 
-    def __create_subdivision_enum(self, code, name, type, country, sanitise_type=True):
-        code = '{0}-{1}'.format(country.code, code)
-        if sanitise_type:
-            return SubdivisionWithParentEnum(code=code, name=self.__clean_name(name),
-                                             type=self.__get_type_alias(self.__create_type(type)), parent=country.code,
-                                             country=country)
-        return SubdivisionWithParentEnum(code=code, name=self.__clean_name(name), type=type, parent=country.code,
-                                         country=country)
-
-    def __get_type_alias(self, type):
-        for subdivision_alias in self.SubdivisionTypeAlias:
-            if type in self.SubdivisionTypeAlias[subdivision_alias]:
-                return subdivision_alias
-        return type
+        has_subdivision3 = bool(html_content.find("table", id='subdivtable3'))
 
-    @staticmethod
-    def __create_type(type):
-        sanitized_type = type.lower()
-        search_result = re.search(r".*\((?P<type>.*)\).*", sanitized_type)
-        if search_result:
-            return search_result.group("type").strip()
-        search_result = re.search(r"(?P<type>.*) \[english] / .* \[.*]", sanitized_type)
-        if search_result:
-            return search_result.group("type").strip()
-        search_result = re.search(r"(?P<type>.*) \[french] / .* \[.*]", sanitized_type)
-        if search_result:
-            return search_result.group("type").strip()
-        search_result = re.search(r".* \[.*] / (?P<type>.*) \[english]", sanitized_type)
-        if search_result:
-            return search_result.group("type").strip()
-        search_result = re.search(r"(?P<type>.*) \[.*]", sanitized_type)
-        if search_result:
-            return search_result.group("type").strip()
-        return sanitized_type if sanitized_type else 'UNKNOWN'
+        return subdivisions, has_subdivision3
 
     @staticmethod
-    def __get_html(url):
-        return BeautifulSoup(GeonamesFetcher.__get_response(url).content, "html.parser")
+    def __create_subdivision_row(code, name, type, country_code, sanitise_type=True):
+        code = '{0}-{1}'.format(country_code, code)
+        if sanitise_type:
+            type = clean_type(type)
+            type = GeonamesFetcher.TYPE_ALIASES.get(type, type)
+        return code, clean_region_name(name), type, country_code
 
     @staticmethod
-    def __get_response(url):
-        headers = {'User-Agent': USER_AGENT.get_random_user_agent()}
-        return requests.get(url, headers=headers)
+    def __get_content(url, revalidate=False):
+        return GeonamesFetcher.__get_response(url, revalidate).content
 
     @staticmethod
-    def __clean_name(name):
-        name = name.replace('*', '')
-        search_result = re.search(r"(?P<name>.*) \(see also separate ISO 3166-1 entry under [A-Z]{2}\)", name)
-        if search_result:
-            return search_result.group("name").strip()
-        return name
+    def __get_response(url, revalidate=False):
+        return HTTP_CLIENT.get(url, revalidate=revalidate)
@@ -0,0 +1,46 @@
+from collections import deque
+
+
+class SubdivisionHierarchy:
+    def __init__(self, country_code, subdivisions):
+        self.country_code = country_code
+        self.subdivisions = subdivisions
+        self.children = {}
+        self.levels = {}
+        self.orphans = []
+        self.cycles = []
+        self.__build()
+
+    def level(self, subdivision):
+        if subdivision.parent == self.country_code:
+            return 1
+        return self.levels[subdivision.parent] + 1 if subdivision.parent in self.levels else 0
+
+    def sorted(self):
+        return sorted(self.subdivisions, key=lambda subdivision: (self.level(subdivision), subdivision.code))
+
+    def __build(self):
+        index = {}
+        for subdivision in self.subdivisions:
+            if subdivision.code not in index:
+                index[subdivision.code] = subdivision
+                self.children.setdefault(subdivision.parent, []).append(subdivision.code)
+
+        pending = deque()
+        for code, subdivision in index.items():
+            if subdivision.parent == self.country_code:
+                self.levels[code] = 1
+                pending.append(code)
+            elif subdivision.parent not in index:
+                self.levels[code] = 0
+                self.orphans.append(subdivision)
+                pending.append(code)
+
+        while pending:
+            code = pending.popleft()
+            for child in self.children.get(code, []):
+                if child not in self.levels:
+                    self.levels[child] = self.levels[code] + 1
+                    pending.append(child)
+
+        self.cycles = [subdivision for code, subdivision in index.items() if code not in self.levels]
@@ -0,0 +1,161 @@
+import codecs
+import hashlib
+import threading
+import time
+
+from . import get_user_agent
+from .instrumentation import INSTRUMENTATION
+from .manifest import get_digest
+from .retry import AdaptiveLimiter, RetryPolicy
+
+from urllib.parse import quote, urlsplit
+
+
+class HttpClient:
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+    THROTTLE_STATUSES = {429, 503}
+
+    def __init__(self, max_per_host=8, timeout=(10, 60), retry_policy=None):
+        self.max_per_host = max_per_host
+        self.timeout = timeout
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.cache = None
+        self.stand_in_url = None
+        self.digests = {}
+        self.__session = None
+        self.__hosts = {}
+        self.__lock = threading.Lock()
+
+    @property
+    def session(self):
+        if self.__session is None:
+            with self.__lock:
+                if self.__session is None:
+                    self.__session = self.__create_session()
+        return self.__session
+
+    def configure(self, max_per_host, timeout=None, retry_policy=None):
+        with self.__lock:
+            self.max_per_host = max_per_host
+            self.timeout = timeout or self.timeout
+            self.retry_policy = retry_policy or self.retry_policy
+            self.__session = None
+            self.__hosts.clear()
+            self.digests = {}
+
+    def __create_session(self):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=self.max_per_host)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def get(self, url, headers=None, revalidate=False, **kwargs):
+        headers = dict(headers or {})
+        headers.setdefault('User-Agent', get_user_agent().get_random_user_agent())
+        if self.cache:
+            response = self.cache.get(url, lambda conditional: self.__get(url, dict(headers, **conditional), **kwargs),
+                                      revalidate)
+        else:
+            response = self.__get(url, headers, **kwargs)
+        self.__set_digest(url, None if kwargs.get('stream') and not response._content_consumed else response.content)
+        return response
+
+    def get_cached(self, url):
+        response = self.cache.lookup(url) if self.cache else None
+        if response is not None:
+            self.__set_digest(url, response.content)
+        return response
+
+    def iter_content(self, url, chunk_size=1 << 16, headers=None):
+        response = self.get(url, headers, stream=True)
+        digest = hashlib.sha256()
+        for chunk in response.iter_content(chunk_size):
+            digest.update(chunk)
+            yield chunk
+        with self.__lock:
+            self.digests[url] = digest.hexdigest()
+
+    def iter_lines(self, url, encoding='utf-8', headers=None):
+        decoder = codecs.getincrementaldecoder(encoding)()
+        pending = ''
+        for chunk in self.iter_content(url, headers=headers):
+            lines = (pending + decoder.decode(chunk)).split('\n')
+            pending = lines.pop()
+            for line in lines:
+                yield line.rstrip('\r')
+        pending += decoder.decode(b'', final=True)
+        if pending:
+            yield pending.rstrip('\r')
+
+    def resolve(self, url):
+        if self.stand_in_url:
+            return '{0}/{1}'.format(self.stand_in_url, quote(url, safe=''))
+        return url
+
+    def record(self, url, content, content_type='text/html; charset=utf-8'):
+        self.__set_digest(url, content)
+        if self.cache:
+            self.cache.put(url, content.encode('utf-8'), content_type)
+
+    def __get(self, url, headers, **kwargs):
+        import requests
+
+        kwargs.setdefault('timeout', self.timeout)
+        host = urlsplit(url).netloc
+        limiter = self.__get_limiter(host)
+        for attempt in range(1, self.retry_policy.attempts + 1):
+            retry_after = None
+            with limiter:
+                started = time.perf_counter()
+                try:
+                    response = self.session.get(self.resolve(url), headers=headers, **kwargs)
+                except (requests.ConnectionError, requests.Timeout) as ex:
+                    INSTRUMENTATION.count('http_errors_total', 1, host=host, error=type(ex).__name__)
+                    if attempt == self.retry_policy.attempts:
+                        raise
+                    response = None
+            if response is not None:
+                INSTRUMENTATION.count('http_requests_total', 1, host=host, status=response.status_code)
+                INSTRUMENTATION.count('http_request_seconds_total', time.perf_counter() - started, host=host)
+                if response.status_code in self.THROTTLE_STATUSES:
+                    limiter.throttled()
+                    INSTRUMENTATION.count('http_throttled_total', 1, host=host)
+                    INSTRUMENTATION.event('http.throttled', host=host, status=response.status_code,
+                                          limit=limiter.limit)
+                else:
+                    limiter.succeeded()
+                if response.status_code not in self.RETRY_STATUSES or attempt == self.retry_policy.attempts:
+                    if not kwargs.get('stream'):
+                        INSTRUMENTATION.count('http_response_bytes_total', len(response.content), host=host)
+                    return response
+                retry_after = self.__get_retry_after(response)
+
+            INSTRUMENTATION.count('http_retries_total', 1, host=host)
+            time.sleep(self.retry_policy.delay(attempt, retry_after))
+
+    def set_digest(self, url, digest):
+        with self.__lock:
+            self.digests[url] = digest
+
+    def __set_digest(self, url, content):
+        self.set_digest(url, None if content is None else get_digest(content))
+
+    def __get_limiter(self, host):
+        with self.__lock:
+            if host not in self.__hosts:
+                self.__hosts[host] = AdaptiveLimiter(self.max_per_host)
+            return self.__hosts[host]
+
+    @staticmethod
+    def __get_retry_after(response):
+        try:
+            return float(response.headers.get('Retry-After'))
+        except (TypeError, ValueError):
+            return None
+
+
+HTTP_CLIENT = HttpClient()
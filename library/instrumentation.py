@@ -0,0 +1,157 @@
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+from contextlib import contextmanager
+
+
+class ConsoleSink:
+    def __init__(self):
+        self.lock = threading.Lock()
+
+    def emit(self, event):
+        if event.get('message'):
+            message = event['message']
+        elif event['event'] == 'stage' and event['status'] == 'failed':
+            country = ' for country {0}'.format(event['country']) if 'country' in event else ''
+            message = "Failed {0}{1}. Ex: {2}".format(event['stage'], country, event['error'])
+        else:
+            return
+        # Workers emit concurrently, a single write per line keeps their messages from interleaving
+        with self.lock:
+            sys.stdout.write(message + '\n')
+            sys.stdout.flush()
+
+    def close(self, metrics):
+        pass
+
+
+class JsonLinesSink:
+    def __init__(self, path):
+        self.file = open(path, 'a', encoding='utf-8')
+        self.lock = threading.Lock()
+
+    def emit(self, event):
+        line = json.dumps(event, ensure_ascii=False, default=str)
+        with self.lock:
+            self.file.write(line + '\n')
+
+    def close(self, metrics):
+        self.file.close()
+
+
+class PrometheusTextSink:
+    def __init__(self, path, prefix='iso3166'):
+        self.path = path
+        self.prefix = prefix
+
+    def emit(self, event):
+        pass
+
+    def close(self, metrics):
+        temporary_path = '{0}.tmp'.format(self.path)
+        with open(temporary_path, 'w', encoding='utf-8') as f:
+            for name in sorted({name for name, _ in metrics}):
+                f.write('# TYPE {0}_{1} counter\n'.format(self.prefix, name))
+                for (metric_name, labels), value in sorted(metrics.items()):
+                    if metric_name == name:
+                        f.write('{0}_{1}{2} {3}\n'.format(self.prefix, name, self.__format_labels(labels), value))
+        os.replace(temporary_path, self.path)
+
+    @staticmethod
+    def __format_labels(labels):
+        if not labels:
+            return ''
+        return '{{{0}}}'.format(','.join('{0}="{1}"'.format(key, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+                                         for key, value in labels))
+
+
+class Instrumentation:
+    def __init__(self):
+        self.sinks = [ConsoleSink()]
+        self.metrics = {}
+        self.profile_stages = set()
+        self.tracemalloc_stages = set()
+        self.profile_folder_path = None
+        self.__lock = threading.Lock()
+        self.__local = threading.local()
+
+    def add_sink(self, sink):
+        self.sinks.append(sink)
+
+    def event(self, name, message=None, level='info', **fields):
+        event = dict(fields, time=time.time(), event=name, level=level)
+        if message:
+            event['message'] = message
+        for sink in self.sinks:
+            sink.emit(event)
+
+    def count(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.__lock:
+            self.metrics[key] = self.metrics.get(key, 0) + value
+
+    @contextmanager
+    def stage(self, name, **labels):
+        fields = {}
+        profiler = self.__start_profiler(name)
+        tracing = self.__start_tracemalloc(name)
+        started = time.perf_counter()
+        status = 'ok'
+        try:
+            yield fields
+        except Exception as ex:
+            status = 'failed'
+            fields['error'] = '{0}: {1}'.format(type(ex).__name__, ex)
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            if tracing:
+                fields['memory_peak'] = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            if profiler:
+                self.__stop_profiler(profiler, name, labels)
+            self.count('stage_seconds_total', elapsed, stage=name, **labels)
+            self.count('stage_runs_total', 1, stage=name, **labels)
+            if status == 'failed':
+                self.count('stage_failures_total', 1, stage=name, **labels)
+            for field, value in fields.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool) and field != 'memory_peak':
+                    self.count('stage_{0}_total'.format(field), value, stage=name, **labels)
+            self.event('stage', stage=name, status=status, seconds=elapsed,
+                       level='info' if status == 'ok' else 'error', **labels, **fields)
+
+    def close(self):
+        with self.__lock:
+            metrics = dict(self.metrics)
+        for sink in self.sinks:
+            sink.close(metrics)
+
+    def __start_profiler(self, name):
+        if name not in self.profile_stages or getattr(self.__local, 'profiling', False):
+            return None
+        self.__local.profiling = True
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler
+
+    def __stop_profiler(self, profiler, name, labels):
+        profiler.disable()
+        self.__local.profiling = False
+        folder_path = self.profile_folder_path or '.'
+        os.makedirs(folder_path, exist_ok=True)
+        suffix = ''.join('-{0}'.format(value) for _, value in sorted(labels.items()))
+        profiler.dump_stats(os.path.join(folder_path, '{0}{1}.prof'.format(name, suffix)))
+
+    def __start_tracemalloc(self, name):
+        if name not in self.tracemalloc_stages or tracemalloc.is_tracing():
+            return False
+        tracemalloc.start()
+        return True
+
+
+INSTRUMENTATION = Instrumentation()
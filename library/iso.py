@@ -1,19 +1,28 @@
 import csv
 import iso4217parse
-import re
-import requests
+import json
+import time
 import xml.etree.ElementTree as ET
 
-from . import USER_AGENT
+from . import get_user_agent
+from .driver_pool import WebDriverPool
+from .http import HTTP_CLIENT
+from .instrumentation import INSTRUMENTATION
+from .manifest import get_digest
 from .model import SubdivisionWithParentEnum, CountryEnum, CurrencyEnum
+from .normalization import clean_currency_name, clean_region_name
+from .parse_pool import PARSE_POOL
+from .retry import RetryPolicy
+from .tables import extract_table_rows
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 
-from bs4 import BeautifulSoup
-from io import StringIO
-from selenium import webdriver
-from selenium.webdriver.support.ui import WebDriverWait, Select
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.options import Options
+
+# Both currency feeds repeat the same few hundred codes, each one is resolved once per process
+@lru_cache(maxsize=None)
+def get_currency_symbol(currency_code):
+    currency = iso4217parse.by_alpha3(currency_code)
+    return currency.symbols[0] if currency and currency.symbols else ''
 
 
 class IsoFetcher:
@@ -22,82 +31,218 @@ class IsoFetcher:
     CURRENCY_URL = 'https://www.six-group.com/dam/download/financial-information/data-center/iso-currrency/lists/list-one.xml'
     DEPRECATED_CURRENCY_URL = 'https://raw.githubusercontent.com/datasets/currency-codes/master/data/codes-all.csv'
 
-    driver_options = Options()
-    driver_options.add_argument(f'user-agent={USER_AGENT.get_random_user_agent()}')
-    driver_options.add_argument("--headless")
+    CHECKPOINT_SOURCE = 'iso.org'
+
+    # Bump whenever parsing or normalization changes the rows read out of an unchanged page
+    PARSER_VERSION = 1
+
+    # Country pages either fill the subdivision table or state that the country has no subdivisions. The code summary
+    # renders apart from the table, so a page showing neither is still loading and is never recorded nor checkpointed
+    NO_SUBDIVISIONS_TEXT = 'No subdivisions'
+    SUBDIVISION_ROWS_XPATH = "//table[@id='subdivision']//tr/td"
+    NO_SUBDIVISIONS_XPATH = "//*[contains(text(), '{0}')]".format(NO_SUBDIVISIONS_TEXT)
+    PAGE_MARKERS = ('id="subdivision"', NO_SUBDIVISIONS_TEXT)
+
+    BLOCKED_URL_PATTERNS = ['*.png', '*.jpg', '*.jpeg', '*.gif', '*.svg', '*.ico', '*.webp', '*.woff', '*.woff2',
+                            '*.ttf', '*.otf', '*.eot', '*.mp4', '*.webm', '*cookielaw.org*', '*onetrust*',
+                            '*google-analytics.com*', '*googletagmanager.com*', '*doubleclick.net*', '*hotjar*']
+    CONSENT_COOKIES = {
+        'OptanonAlertBoxClosed': '2024-01-01T00:00:00.000Z',
+        'OptanonConsent': 'isGpcEnabled=0&interactionCount=1&landingPath=NotLandingPage'
+                          '&groups=C0001%3A1%2CC0002%3A0%2CC0003%3A0%2CC0004%3A0',
+    }
 
     driver_path = None
+    checkpoint = None
 
-    def __init__(self, driver_path):
+    def __init__(self, driver_path, pool_size=1, max_pages_per_session=50, page_timeout=30, interaction_timeout=10,
+                 retry_policy=None, lean=False, backend='selenium'):
         self.driver_path = driver_path
+        self.lean = lean
+        self.backend = backend
+        self.pool_size = pool_size
+        self.max_pages_per_session = max_pages_per_session
+        self.page_timeout = page_timeout
+        self.interaction_timeout = interaction_timeout
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.__driver_pool = None
+
+    @property
+    def driver_pool(self):
+        if self.__driver_pool is None:
+            self.__driver_pool = WebDriverPool(self.driver_path, self.create_driver_options(self.lean),
+                                               self.pool_size, self.max_pages_per_session,
+                                               self.setup_lean_driver if self.lean else None)
+        return self.__driver_pool
+
+    @staticmethod
+    def create_driver_options(lean=False):
+        from selenium.webdriver.chrome.options import Options
+
+        driver_options = Options()
+        driver_options.add_argument(f'user-agent={get_user_agent().get_random_user_agent()}')
+        driver_options.add_argument("--headless")
+        if lean:
+            driver_options.page_load_strategy = 'eager'
+            driver_options.add_argument('--blink-settings=imagesEnabled=false')
+            for argument in ('--disable-extensions', '--disable-background-networking', '--disable-default-apps',
+                             '--disable-sync', '--mute-audio', '--no-first-run'):
+                driver_options.add_argument(argument)
+            driver_options.add_experimental_option('prefs', {
+                'profile.managed_default_content_settings.images': 2,
+                'profile.managed_default_content_settings.media_stream': 2,
+                'profile.managed_default_content_settings.notifications': 2,
+            })
+        return driver_options
+
+    @staticmethod
+    def setup_lean_driver(driver):
+        driver.execute_cdp_cmd('Network.enable', {})
+        driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': IsoFetcher.BLOCKED_URL_PATTERNS})
+        for name, value in IsoFetcher.CONSENT_COOKIES.items():
+            driver.execute_cdp_cmd('Network.setCookie', {'name': name, 'value': value, 'domain': '.iso.org',
+                                                         'path': '/', 'secure': True})
+
+    def close(self):
+        if self.__driver_pool is not None:
+            self.__driver_pool.report()
+            self.__driver_pool.close()
+            self.__driver_pool = None
 
     def get_countries(self):
-        print("Getting countries")
-        driver = webdriver.Chrome(self.driver_path, options=self.driver_options)
+        INSTRUMENTATION.event('iso.countries', "Getting countries")
+        if self.backend == 'http':
+            with INSTRUMENTATION.stage('iso.countries', backend='http') as stage:
+                page_source = self.__get_http_page(self.COUNTRY_URL, ('role="grid"',))
+                countries = self.__get_countries_from_html_content(page_source) if page_source else []
+                stage['rows'] = len(countries)
+            if countries:
+                self.__set_rows_digest(self.COUNTRY_URL, [(country.code, country.name) for country in countries])
+                return countries
+            INSTRUMENTATION.event('iso.fallback', stage='iso.countries', backend='selenium')
+        for attempt in range(1, self.retry_policy.attempts + 1):
+            try:
+                with INSTRUMENTATION.stage('iso.countries') as stage, self.driver_pool.session() as driver:
+                    countries = self.__get_countries(driver)
+                    stage['rows'] = len(countries)
+                self.__set_rows_digest(self.COUNTRY_URL, [(country.code, country.name) for country in countries])
+                return countries
+            except Exception:
+                self.__wait_retry('iso.countries', attempt)
+        return []
+
+    def __get_countries(self, driver):
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.webdriver.support.ui import WebDriverWait, Select
+
+        timeout = self.interaction_timeout
+        driver.get(HTTP_CLIENT.resolve(self.COUNTRY_URL))
+        if not self.lean:
+            WebDriverWait(driver, timeout).until(
+                EC.element_to_be_clickable((By.ID, "onetrust-accept-btn-handler"))).click()
+        WebDriverWait(driver, timeout).until(EC.element_to_be_clickable((By.ID, "gwt-uid-12"))).click()
+        WebDriverWait(driver, timeout).until(
+            EC.element_to_be_clickable((By.XPATH, "//div[contains(@class,'v-button-go')]"))).click()
+        WebDriverWait(driver, timeout).until(
+            EC.presence_of_element_located((By.XPATH, "//select[contains(@class, 'v-select-select')]")))
+        Select(driver.find_element(By.XPATH,
+                                   "//select[contains(@class, 'v-select-select')]")).select_by_visible_text(
+            '300')
+        WebDriverWait(driver, self.page_timeout).until(
+            EC.presence_of_element_located((By.XPATH, "//table//tr/td[contains(text(), 'Zimbabwe')]")))
+        page_source = driver.page_source
+        HTTP_CLIENT.record(self.COUNTRY_URL, page_source)
+        return self.__get_countries_from_html_content(page_source)
+
+    def __get_countries_from_html_content(self, page_source):
         countries = []
-        try:
-            driver.get(self.COUNTRY_URL)
-            WebDriverWait(driver, 10).until(EC.element_to_be_clickable((By.ID, "onetrust-accept-btn-handler"))).click()
-            WebDriverWait(driver, 10).until(EC.element_to_be_clickable((By.ID, "gwt-uid-12"))).click()
-            WebDriverWait(driver, 10).until(
-                EC.element_to_be_clickable((By.XPATH, "//div[contains(@class,'v-button-go')]"))).click()
-            WebDriverWait(driver, 10).until(
-                EC.presence_of_element_located((By.XPATH, "//select[contains(@class, 'v-select-select')]")))
-            Select(driver.find_element(By.XPATH,
-                                       "//select[contains(@class, 'v-select-select')]")).select_by_visible_text(
-                '300')
-            WebDriverWait(driver, 10).until(
-                EC.presence_of_element_located((By.XPATH, "//table//tr/td[contains(text(), 'Zimbabwe')]")))
-            rows = BeautifulSoup(driver.page_source, "html.parser").find("table", attrs={'role': 'grid'}).find_all(
-                "tr")
-            for row in rows:
-                cells = row.find_all("td")
-                if cells:
-                    name = self.__clean_region_name(cells[0].get_text()).strip()
-                    code = cells[2].get_text().strip()
-                    countries.append(CountryEnum(code, name, '', ''))
-            return countries
-        except Exception as ex:
-            print("Failed loading countries. Ex: {0}".format(ex))
-            return []
-        finally:
-            driver.close()
+        for cells in extract_table_rows(page_source, role='grid') or []:
+            name = clean_region_name(cells[0]).strip()
+            code = cells[2].strip()
+            countries.append(CountryEnum(code, name, '', ''))
+        return countries
 
     def get_subdivisions(self, country):
-        print("Getting subdivisions for country {0}".format(country.code))
+        if self.checkpoint:
+            subdivisions = self.checkpoint.load_subdivisions(self.CHECKPOINT_SOURCE, country)
+            if subdivisions is not None:
+                INSTRUMENTATION.event('iso.subdivisions', "Resuming subdivisions for country {0}".format(country.code),
+                                      country=country.code, resumed=True)
+                return subdivisions
+
+        INSTRUMENTATION.event('iso.subdivisions', "Getting subdivisions for country {0}".format(country.code),
+                              country=country.code)
+        html_content = self.__get_subdivisions_html(country)
+        if html_content is None:
+            return []
+        # Cached and stand-in pages are byte for byte stable, an unchanged page reuses the rows checkpointed for it
+        page_digest = get_digest(html_content, self.PARSER_VERSION)
+        subdivision_url = self.SUBDIVISION_URL.format(country.code)
+        if self.checkpoint:
+            subdivisions = self.checkpoint.load_subdivisions(self.CHECKPOINT_SOURCE, country, page_digest)
+            if subdivisions is not None:
+                INSTRUMENTATION.event('iso.subdivisions', country=country.code, unchanged=True)
+                self.__set_rows_digest(subdivision_url, [(subdivision.code, subdivision.name, subdivision.type,
+                                                          subdivision.parent) for subdivision in subdivisions])
+                return subdivisions
         try:
-            return self.__get_subdivision_from_html_content(country, self.__get_subdivisions_html(country))
-        except Exception as ex:
-            print("Failed getting subdivisions for country {0}. Ex: {1}".format(country.code, ex))
+            with INSTRUMENTATION.stage('iso.parse_subdivisions', country=country.code) as stage:
+                rows = PARSE_POOL.parse(IsoFetcher.parse_subdivisions, country.code, html_content)
+                stage['rows'] = len(rows)
+        except Exception:
             return []
+        if not rows and self.NO_SUBDIVISIONS_TEXT not in html_content:
+            INSTRUMENTATION.event('iso.incomplete_page', "WARNING: Subdivision page of country {0} was not rendered"
+                                  .format(country.code), level='warning', country=country.code)
+            return []
+        self.__set_rows_digest(subdivision_url, rows)
+        subdivisions = [SubdivisionWithParentEnum(code, name, type, parent, country)
+                        for code, name, type, parent in rows]
+        if self.checkpoint:
+            self.checkpoint.save_subdivisions(self.CHECKPOINT_SOURCE, country, subdivisions, page_digest)
+        return subdivisions
+
+    def get_subdivisions_by_country(self, countries):
+        with ThreadPoolExecutor(max_workers=self.driver_pool.size) as executor:
+            return dict(zip([country.code for country in countries], executor.map(self.get_subdivisions, countries)))
 
     def get_currencies(self):
         currencies = set()
 
-        response = requests.get(self.CURRENCY_URL)
-        root = ET.fromstring(response.text)
-
-        for ccy_ntry in root.findall('.//CcyNtry'):
-            ccy_nm = ccy_ntry.find('CcyNm')
-            ccy = ccy_ntry.find('Ccy')
-            if ccy is not None and ccy_nm is not None:
-                currency_name = ccy_nm.text
-                currency_code = ccy.text
-                currencies.add(
-                    CurrencyEnum(currency_code, currency_name, self.get_currency_symbol(currency_code), False)
-                )
+        parser = ET.XMLPullParser(events=('start', 'end'))
+        parents = []
+        for chunk in HTTP_CLIENT.iter_content(self.CURRENCY_URL):
+            parser.feed(chunk)
+            self.__add_currencies(currencies, parser, parents)
+        parser.close()
+        self.__add_currencies(currencies, parser, parents)
 
         return currencies
 
+    def __add_currencies(self, currencies, parser, parents):
+        for event, element in parser.read_events():
+            if event == 'start':
+                parents.append(element)
+                continue
+            parents.pop()
+            if element.tag != 'CcyNtry':
+                continue
+            ccy_nm = element.find('CcyNm')
+            ccy = element.find('Ccy')
+            if ccy is not None and ccy_nm is not None:
+                currencies.add(CurrencyEnum(ccy.text, ccy_nm.text, self.get_currency_symbol(ccy.text), False))
+            # Read entries are detached from their table, so the parsed tree never outgrows a single entry
+            if parents:
+                parents[-1].remove(element)
+
     def get_deprecated_currencies(self):
         currencies = set()
 
-        resp = requests.get(self.DEPRECATED_CURRENCY_URL)
-        data = csv.DictReader(StringIO(resp.text))
-        for row in data:
+        for row in csv.DictReader(HTTP_CLIENT.iter_lines(self.DEPRECATED_CURRENCY_URL)):
             if row.get("WithdrawalDate", "").strip():
                 currencies.add(
-                    CurrencyEnum(row.get('AlphabeticCode'), self.__clean_currency_name(row.get('Currency')),
+                    CurrencyEnum(row.get('AlphabeticCode'), clean_currency_name(row.get('Currency')),
                                  self.get_currency_symbol(row.get('AlphabeticCode')), False)
                 )
 
@@ -105,39 +250,79 @@ class IsoFetcher:
 
     @staticmethod
     def get_currency_symbol(currency_code):
-        currency = iso4217parse.by_alpha3(currency_code)
-        return currency.symbols[0] if currency and currency.symbols else ''
+        return get_currency_symbol(currency_code)
 
     def __get_subdivisions_html(self, country):
-        driver = webdriver.Chrome(self.driver_path, options=self.driver_options)
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.webdriver.support.ui import WebDriverWait
+
+        subdivision_url = self.SUBDIVISION_URL.format(country.code)
+        if self.backend == 'http':
+            # Refetched countries never read a cached page, they are fetched again from a stand-in or rendered again
+            revalidate = bool(self.checkpoint and self.checkpoint.is_refetched(country))
+            with INSTRUMENTATION.stage('iso.fetch_subdivisions', country=country.code, backend='http') as stage:
+                page_source = self.__get_http_page(subdivision_url, self.PAGE_MARKERS, revalidate)
+                stage['bytes'] = len(page_source) if page_source else 0
+            if page_source:
+                return page_source
+            INSTRUMENTATION.event('iso.fallback', stage='iso.fetch_subdivisions', backend='selenium',
+                                  country=country.code)
+
+        for attempt in range(1, self.retry_policy.attempts + 1):
+            try:
+                with INSTRUMENTATION.stage('iso.fetch_subdivisions', country=country.code) as stage, \
+                        self.driver_pool.session() as driver:
+                    driver.get(HTTP_CLIENT.resolve(subdivision_url))
+                    WebDriverWait(driver, self.page_timeout).until(EC.any_of(
+                        EC.presence_of_element_located((By.XPATH, self.SUBDIVISION_ROWS_XPATH)),
+                        EC.presence_of_element_located((By.XPATH, self.NO_SUBDIVISIONS_XPATH))))
+                    if not driver.find_elements(By.XPATH, self.SUBDIVISION_ROWS_XPATH):
+                        INSTRUMENTATION.event('iso.no_subdivisions', country=country.code)
+                    page_source = driver.page_source
+                    HTTP_CLIENT.record(subdivision_url, page_source)
+                    stage['bytes'] = len(page_source)
+                    return page_source
+            except Exception:
+                self.__wait_retry('iso.fetch_subdivisions', attempt)
+        return None
+
+    @staticmethod
+    def __get_http_page(url, markers, revalidate=False):
+        # Live iso.org only serves the page shell over plain http, pages are read from a stand-in or a fresh cache entry
         try:
-            driver.get(self.SUBDIVISION_URL.format(country.code))
-            element_present = EC.presence_of_element_located((By.ID, 'subdivision'))
-            WebDriverWait(driver, 30).until(element_present)
-            return driver.page_source
-        except Exception as ex:
-            print("Failed loading '{0} subdivisions'. Ex: {1}".format(country.code, ex))
+            if HTTP_CLIENT.stand_in_url:
+                response = HTTP_CLIENT.get(url, revalidate=revalidate)
+            else:
+                response = None if revalidate else HTTP_CLIENT.get_cached(url)
+        except Exception:
+            return None
+        if response is None or response.status_code != 200 or not any(marker in response.text for marker in markers):
             return None
-        finally:
-            driver.close()
+        return response.text
+
+    @staticmethod
+    def __set_rows_digest(url, rows):
+        # Rendered pages carry dynamic element ids, so a page is identified by the rows parsed out of it
+        HTTP_CLIENT.set_digest(url, get_digest(json.dumps(rows, ensure_ascii=False)))
+
+    def __wait_retry(self, stage, attempt):
+        if attempt < self.retry_policy.attempts:
+            INSTRUMENTATION.count('retries_total', 1, stage=stage)
+            time.sleep(self.retry_policy.delay(attempt))
 
-    def __get_subdivision_from_html_content(self, country, html_content):
+    @staticmethod
+    def parse_subdivisions(country_code, html_content):
         subdivisions = {}
-        html = BeautifulSoup(html_content, "html.parser")
-        rows = html.find("table", id='subdivision').find_all("tr")
-        for row in rows:
-            cells = row.find_all("td")
-            if cells:
-                type = cells[0].get_text().strip()
-                code = self.__clean_subdivision_code(cells[1].get_text().strip())
-                name = self.__clean_region_name(cells[2].get_text().strip())
-                language = cells[4].get_text().strip()
-                parent = cells[6].get_text().strip()
-                if not parent:
-                    parent = country.code
-                subdivisions.setdefault(code, {}).setdefault(language,
-                                                             SubdivisionWithParentEnum(code, name, type, parent,
-                                                                                       country))
+        for cells in extract_table_rows(html_content, id='subdivision') or []:
+            type = cells[0].strip()
+            code = IsoFetcher.__clean_subdivision_code(cells[1].strip())
+            name = clean_region_name(cells[2].strip())
+            language = cells[4].strip()
+            parent = cells[6].strip()
+            if not parent:
+                parent = country_code
+            subdivisions.setdefault(code, {}).setdefault(language, (code, name, type, parent))
 
         language_subdivisions = []
         for subdivision in subdivisions:
@@ -148,21 +333,6 @@ class IsoFetcher:
                 language_subdivisions.append(subdivisions[subdivision][first_language])
         return language_subdivisions
 
-    @staticmethod
-    def __clean_region_name(name):
-        name = name.replace('*', '')
-        search_result = re.search(r"(?P<name>.*) \(see also separate country code entry under [A-Z]{2}\)", name)
-        if search_result:
-            return search_result.group("name").strip()
-        return name
-
     @staticmethod
     def __clean_subdivision_code(code):
         return code.replace('*', '')
-
-    @staticmethod
-    def __clean_currency_name(name):
-        cleaned = re.sub(r'"[^"]*"\s*', '', name)
-        cleaned = cleaned.replace('\u00A0', ' ')
-        cleaned = re.sub(r'\s+', ' ', cleaned)
-        return cleaned.strip()
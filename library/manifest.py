@@ -0,0 +1,63 @@
+import hashlib
+import json
+import os
+
+
+def get_digest(content, salt=None):
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    digest = hashlib.sha256()
+    if salt is not None:
+        digest.update('{0}\0'.format(salt).encode('utf-8'))
+    digest.update(content)
+    return digest.hexdigest()
+
+
+def get_file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class Manifest:
+    def __init__(self, path):
+        self.path = path
+        self.sources = {}
+        self.outputs = {}
+        self.inputs = None
+        self.__previous = {'sources': {}, 'outputs': {}, 'inputs': None}
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                self.__previous = json.load(f)
+
+    def set_sources(self, source_digests, settings=()):
+        self.sources = dict(source_digests)
+        if any(digest is None for digest in self.sources.values()):
+            self.inputs = None
+        else:
+            self.inputs = get_digest(json.dumps([sorted(self.sources.items()), list(settings)]))
+
+    def changed_sources(self):
+        previous = self.__previous['sources']
+        return sorted(url for url, digest in self.sources.items() if digest is None or previous.get(url) != digest)
+
+    def is_up_to_date(self, folder_path):
+        if self.inputs is None or self.inputs != self.__previous['inputs'] or not self.__previous['outputs']:
+            return False
+        for name, digest in self.__previous['outputs'].items():
+            path = os.path.join(folder_path, name)
+            if not os.path.exists(path) or get_file_digest(path) != digest:
+                return False
+        return True
+
+    def record_outputs(self, output_digests):
+        self.outputs.update(output_digests)
+
+    def save(self):
+        temporary_path = '{0}.tmp'.format(self.path)
+        with open(temporary_path, 'w', encoding='utf-8') as f:
+            json.dump({'inputs': self.inputs, 'sources': self.sources, 'outputs': self.outputs}, f, indent=2,
+                      sort_keys=True)
+        os.replace(temporary_path, self.path)
@@ -0,0 +1,102 @@
+import json
+
+from .emitter import AtomicFile
+from .instrumentation import INSTRUMENTATION
+
+
+class MergeReport:
+    def __init__(self):
+        self.winners = {}
+        self.dropped = []
+        self.conflicts = []
+
+    def won(self, kind, source):
+        kind_winners = self.winners.setdefault(kind, {})
+        kind_winners[source] = kind_winners.get(source, 0) + 1
+
+    def drop(self, kind, code, source, reason):
+        self.dropped.append({'kind': kind, 'code': code, 'source': source, 'reason': reason})
+
+    def conflict(self, kind, code, field, values):
+        self.conflicts.append({'kind': kind, 'code': code, 'field': field, 'values': values})
+
+    def to_dict(self):
+        return {'winners': self.winners, 'dropped': self.dropped, 'conflicts': self.conflicts}
+
+    def write(self, path):
+        output_file = AtomicFile(path)
+        try:
+            json.dump(self.to_dict(), output_file.file, indent=2, ensure_ascii=False)
+        except BaseException:
+            output_file.abort()
+            raise
+        return output_file.commit()
+
+    def print_summary(self):
+        for kind in sorted(self.winners):
+            INSTRUMENTATION.event('merge.winners', "Merged {0}: {1}".format(kind, ", ".join(
+                "{0} from {1}".format(count, source) for source, count in sorted(self.winners[kind].items()))),
+                kind=kind, winners=self.winners[kind])
+        INSTRUMENTATION.event('merge.summary', "Dropped {0} records, found {1} conflicts".format(
+            len(self.dropped), len(self.conflicts)), dropped=len(self.dropped), conflicts=len(self.conflicts))
+
+
+class DatasetMerger:
+    SUBDIVISION_FIELDS = ('name', 'type', 'parent')
+    CURRENCY_FIELDS = ('name', 'symbol')
+
+    def __init__(self):
+        self.report = MergeReport()
+
+    def merge_countries(self, sources, repairs=()):
+        countries = self.__merge('country', sources, ('name',))
+        for source, repair_countries, fields in repairs:
+            index = {country.code: country for country in repair_countries}
+            for country in countries:
+                repair_country = index.get(country.code)
+                for field in fields:
+                    if repair_country is None:
+                        self.report.conflict('country', country.code, field, {source: None})
+                    else:
+                        setattr(country, field, getattr(repair_country, field))
+        return countries
+
+    def merge_subdivisions(self, sources):
+        continent_subdivisions = {}
+        for subdivision in self.__merge('subdivision', sources, self.SUBDIVISION_FIELDS):
+            continent_subdivisions.setdefault(subdivision.country.continent, []).append(subdivision)
+        return continent_subdivisions
+
+    def merge_currencies(self, sources, used_codes=None):
+        filtered_sources = []
+        for source, currencies, filtered in sources:
+            if filtered and used_codes is not None:
+                kept = []
+                for currency in currencies:
+                    if currency.code in used_codes:
+                        kept.append(currency)
+                    else:
+                        self.report.drop('currency', currency.code, source, 'not used by any country')
+                currencies = kept
+            filtered_sources.append((source, currencies))
+        return self.__merge('currency', filtered_sources, self.CURRENCY_FIELDS)
+
+    def __merge(self, kind, sources, fields):
+        merged = {}
+        for source, records in sources:
+            for record in records:
+                winner = merged.get(record.code)
+                if winner is None:
+                    merged[record.code] = (source, record)
+                    continue
+                winner_source, winner_record = winner
+                self.report.drop(kind, record.code, source, 'superseded by {0}'.format(winner_source))
+                for field in fields:
+                    winner_value = getattr(winner_record, field)
+                    value = getattr(record, field)
+                    if winner_value != value:
+                        self.report.conflict(kind, record.code, field, {winner_source: winner_value, source: value})
+
+        for source, _ in merged.values():
+            self.report.won(kind, source)
+        return [record for _, record in merged.values()]
@@ -1,5 +1,9 @@
+import sys
+
 from dataclasses import dataclass
 
+from .normalization import to_enum_identifier
+
 replacements_of = {
     "IN_CT": "IN-CG",
     "IN_OR": "IN-OD",
@@ -39,6 +43,10 @@ replacements_of = {
     "ZA_NL": "ZA-KZN",
 }
 
+replacements_by_code = {}
+for replaced_code, replacement_code in sorted(replacements_of.items()):
+    replacements_by_code.setdefault(replacement_code, []).append(replaced_code)
+
 
 @dataclass
 class CountryEnum:
@@ -53,6 +61,9 @@ class CountryEnum:
 
         return '{0}("{1}", {2}),\n'.format(self.code, self.name, self.continent)
 
+    def to_record(self):
+        return {'code': self.code, 'name': self.name, 'continent': self.continent, 'currency': self.currency}
+
 
 @dataclass(frozen=True)
 class CurrencyEnum:
@@ -66,6 +77,9 @@ class CurrencyEnum:
             return '{0}("{1}", true),\n'.format(self.code, self.name)
         return '{0}("{1}", "{2}"),\n'.format(self.code, self.name, self.symbol)
 
+    def to_record(self):
+        return {'code': self.code, 'name': self.name, 'symbol': self.symbol, 'test': self.test}
+
     def __hash__(self):
         return hash(self.code)
 
@@ -73,34 +87,43 @@ class CurrencyEnum:
         return self.code == other.code
 
 
-@dataclass
 class SubdivisionWithParentEnum:
-    code: str
-    name: str
-    type: str
-    parent: str
-    country: CountryEnum
+    __slots__ = ('code', 'name', 'type', 'parent', 'country')
 
-    def to_java_enum(self):
-        if self.code in replacements_of.values():
-            up_to_date = '{0}("{1}", {2}, {3}),\n'.format(self.code.replace('-', '_'), self.name,
-                                                          to_type(self.type), self.parent.replace('-', '_'))
+    def __init__(self, code, name, type, parent, country):
+        self.code = code
+        self.name = name
+        self.type = sys.intern(type)
+        self.parent = sys.intern(parent)
+        self.country = country
+
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return (self.code, self.name, self.type, self.parent, self.country) == \
+            (other.code, other.name, other.type, other.parent, other.country)
 
-            replacements = self.__get_keys_by_value(replacements_of, self.code)
-            replacements.sort()
-            for replacement in replacements:
-                up_to_date += '{0}("{1}", {2}, {3}, {4}),\n'.format(replacement, self.name,
-                                                                    to_type(self.type), self.parent.replace('-', '_'),
-                                                                    self.code.replace('-', '_'))
+    __hash__ = None
 
-            return up_to_date
-        else:
-            return '{0}("{1}", {2}, {3}),\n'.format(self.code.replace('-', '_'), self.name,
-                                                    to_type(self.type), self.parent.replace('-', '_'))
+    def __repr__(self):
+        return 'SubdivisionWithParentEnum(code={0!r}, name={1!r}, type={2!r}, parent={3!r}, country={4!r})'.format(
+            self.code, self.name, self.type, self.parent, self.country)
+
+    def __reduce__(self):
+        return SubdivisionWithParentEnum, (self.code, self.name, self.type, self.parent, self.country)
+
+    def to_java_enum(self):
+        up_to_date = '{0}("{1}", {2}, {3}),\n'.format(self.code.replace('-', '_'), self.name,
+                                                      to_type(self.type), self.parent.replace('-', '_'))
+        for replacement in replacements_by_code.get(self.code, []):
+            up_to_date += '{0}("{1}", {2}, {3}, {4}),\n'.format(replacement, self.name,
+                                                                to_type(self.type), self.parent.replace('-', '_'),
+                                                                self.code.replace('-', '_'))
+        return up_to_date
 
-    @staticmethod
-    def __get_keys_by_value(dict, value):
-        return [key for key, val in dict.items() if val == value]
+    def to_record(self):
+        return {'code': self.code, 'name': self.name, 'type': self.type, 'parent': self.parent,
+                'country': self.country.code, 'replaces': replacements_by_code.get(self.code, [])}
 
 
 def to_type_enum(type):
@@ -108,4 +131,4 @@ def to_type_enum(type):
 
 
 def to_type(type):
-    return type.upper().replace(' ', '_').replace('-', '_').replace('(', '').replace(')', '').replace(',', '')
+    return to_enum_identifier(type)
@@ -0,0 +1,99 @@
+import re
+
+from .instrumentation import INSTRUMENTATION
+
+from functools import lru_cache
+
+MEMO_SIZE = 4096
+
+TYPE_PATTERNS = [
+    re.compile(r".*\((?P<type>.*)\).*"),
+    re.compile(r"(?P<type>.*) \[english] / .* \[.*]"),
+    re.compile(r"(?P<type>.*) \[french] / .* \[.*]"),
+    re.compile(r".* \[.*] / (?P<type>.*) \[english]"),
+    re.compile(r"(?P<type>.*) \[.*]"),
+]
+REGION_NAME_PATTERN = re.compile(
+    r"(?P<name>.*) \(see also separate (?:ISO 3166-1 entry|country code entry) under [A-Z]{2}\)")
+CURRENCY_QUOTE_PATTERN = re.compile(r'"[^"]*"\s*')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+ENUM_IDENTIFIER_TABLE = str.maketrans({' ': '_', '-': '_', '(': None, ')': None, ',': None})
+
+
+def invert_aliases(aliases):
+    inverted = {}
+    for alias, values in aliases.items():
+        for value in values:
+            inverted.setdefault(value, alias)
+    return inverted
+
+
+@lru_cache(maxsize=MEMO_SIZE)
+def clean_type(type):
+    sanitized_type = type.lower()
+    for pattern in TYPE_PATTERNS:
+        search_result = pattern.search(sanitized_type)
+        if search_result:
+            return search_result.group("type").strip()
+    return sanitized_type if sanitized_type else 'UNKNOWN'
+
+
+@lru_cache(maxsize=MEMO_SIZE)
+def clean_region_name(name):
+    name = name.replace('*', '')
+    search_result = REGION_NAME_PATTERN.search(name)
+    if search_result:
+        return search_result.group("name").strip()
+    return name
+
+
+@lru_cache(maxsize=MEMO_SIZE)
+def clean_currency_name(name):
+    cleaned = CURRENCY_QUOTE_PATTERN.sub('', name)
+    cleaned = cleaned.replace('\u00A0', ' ')
+    cleaned = WHITESPACE_PATTERN.sub(' ', cleaned)
+    return cleaned.strip()
+
+
+@lru_cache(maxsize=MEMO_SIZE)
+def to_enum_identifier(type):
+    return type.upper().translate(ENUM_IDENTIFIER_TABLE)
+
+
+MEMOIZED = (clean_type, clean_region_name, clean_currency_name, to_enum_identifier)
+
+
+def cache_stats():
+    stats = []
+    for function in MEMOIZED:
+        info = function.cache_info()
+        calls = info.hits + info.misses
+        stats.append({'function': function.__name__, 'hits': info.hits, 'misses': info.misses,
+                      'size': info.currsize, 'max_size': info.maxsize,
+                      'hit_rate': info.hits / calls if calls else 0.0})
+    return stats
+
+
+def merge_cache_stats(*process_stats):
+    merged = {}
+    for stats in process_stats:
+        for function_stats in stats:
+            total = merged.setdefault(function_stats['function'], dict(function_stats, hits=0, misses=0, size=0))
+            for key in ('hits', 'misses', 'size'):
+                total[key] += function_stats[key]
+    for total in merged.values():
+        calls = total['hits'] + total['misses']
+        total['hit_rate'] = total['hits'] / calls if calls else 0.0
+    return list(merged.values())
+
+
+def cache_clear():
+    for function in MEMOIZED:
+        function.cache_clear()
+
+
+def report(worker_stats=()):
+    for stats in merge_cache_stats(cache_stats(), *worker_stats):
+        if stats['hits'] or stats['misses']:
+            INSTRUMENTATION.event('normalization.cache', "Normalization {0}: {1} calls, {2:.1%} hit rate".format(
+                stats['function'], stats['hits'] + stats['misses'], stats['hit_rate']), **stats)
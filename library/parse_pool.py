@@ -0,0 +1,54 @@
+import multiprocessing
+import os
+import threading
+
+from .normalization import cache_stats
+
+
+def parse_with_stats(function, args):
+    # Normalization caches live in each worker process, their stats travel back with every result
+    return function(*args), os.getpid(), cache_stats()
+
+
+class ParsePool:
+    def __init__(self, workers=0):
+        self.workers = workers
+        self.__executor = None
+        self.__worker_stats = {}
+        self.__lock = threading.Lock()
+
+    def configure(self, workers):
+        self.close()
+        self.workers = workers
+        with self.__lock:
+            self.__worker_stats = {}
+
+    def parse(self, function, *args):
+        if self.workers <= 0:
+            return function(*args)
+        result, pid, stats = self.__get_executor().submit(parse_with_stats, function, args).result()
+        with self.__lock:
+            self.__worker_stats[pid] = stats
+        return result
+
+    def worker_cache_stats(self):
+        with self.__lock:
+            return list(self.__worker_stats.values())
+
+    def close(self):
+        with self.__lock:
+            if self.__executor is not None:
+                self.__executor.shutdown()
+                self.__executor = None
+
+    def __get_executor(self):
+        from concurrent.futures import ProcessPoolExecutor
+
+        with self.__lock:
+            if self.__executor is None:
+                self.__executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                      mp_context=multiprocessing.get_context('spawn'))
+            return self.__executor
+
+
+PARSE_POOL = ParsePool()
@@ -0,0 +1,49 @@
+import random
+import threading
+
+
+class RetryPolicy:
+    def __init__(self, attempts=4, base_delay=1.0, max_delay=30.0):
+        self.attempts = max(1, attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt, retry_after=None):
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+
+class AdaptiveLimiter:
+    def __init__(self, max_limit, min_limit=1):
+        self.max_limit = max(min_limit, max_limit)
+        self.min_limit = min_limit
+        self.limit = self.max_limit
+        self.__in_flight = 0
+        self.__healthy = 0
+        self.__condition = threading.Condition()
+
+    def __enter__(self):
+        with self.__condition:
+            while self.__in_flight >= self.limit:
+                self.__condition.wait()
+            self.__in_flight += 1
+        return self
+
+    def __exit__(self, *args):
+        with self.__condition:
+            self.__in_flight -= 1
+            self.__condition.notify()
+
+    def succeeded(self):
+        with self.__condition:
+            self.__healthy += 1
+            if self.__healthy >= self.limit and self.limit < self.max_limit:
+                self.limit += 1
+                self.__healthy = 0
+                self.__condition.notify()
+
+    def throttled(self):
+        with self.__condition:
+            self.limit = max(self.min_limit, self.limit // 2)
+            self.__healthy = 0
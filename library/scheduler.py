@@ -0,0 +1,73 @@
+import time
+
+from .instrumentation import INSTRUMENTATION
+
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+class StageScheduler:
+    def __init__(self, workers=4):
+        self.workers = workers
+        self.stages = {}
+        self.timings = {}
+        self.__started = None
+
+    def add(self, name, function, inputs=()):
+        if name in self.stages:
+            raise ValueError("Stage {0} is already scheduled".format(name))
+        self.stages[name] = (function, tuple(inputs))
+
+    def run(self):
+        for name, (_, inputs) in self.stages.items():
+            for input_name in inputs:
+                if input_name not in self.stages:
+                    raise ValueError("Stage {0} depends on unknown stage {1}".format(name, input_name))
+
+        results = {}
+        pending = dict(self.stages)
+        running = {}
+        self.timings = {}
+        self.__started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(1, self.workers)) as executor:
+            while pending or running:
+                for name in [name for name, (_, inputs) in pending.items() if all(i in results for i in inputs)]:
+                    function, inputs = pending.pop(name)
+                    running[executor.submit(self.__run_stage, name, function,
+                                            [results[input_name] for input_name in inputs])] = name
+                if not running:
+                    raise ValueError("Stages {0} have cyclic inputs".format(sorted(pending)))
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results[running.pop(future)] = future.result()
+        return results
+
+    def critical_path(self):
+        if not self.timings:
+            return []
+        path = []
+        name = max(self.timings, key=lambda stage_name: self.timings[stage_name][1])
+        while name is not None:
+            path.append(name)
+            inputs = self.stages[name][1]
+            name = max(inputs, key=lambda input_name: self.timings[input_name][1]) if inputs else None
+        return path[::-1]
+
+    def print_critical_path(self):
+        path = self.critical_path()
+        if not path:
+            return
+        total = sum(finished - started for started, finished in self.timings.values())
+        elapsed = self.timings[path[-1]][1]
+        INSTRUMENTATION.event('scheduler.critical_path', "Critical path took {0:.2f}s, {1:.2f}s of stage time ran "
+                              "concurrently".format(elapsed, total), path=path, seconds=elapsed, stage_seconds=total)
+        for name in path:
+            started, finished = self.timings[name]
+            INSTRUMENTATION.event('scheduler.critical_stage', "  {0}: {1:.2f}s (started at {2:.2f}s)".format(
+                name, finished - started, started), stage=name, started=started, seconds=finished - started)
+
+    def __run_stage(self, name, function, inputs):
+        started = time.perf_counter() - self.__started
+        try:
+            return function(*inputs)
+        finally:
+            self.timings[name] = (started, time.perf_counter() - self.__started)
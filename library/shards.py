@@ -0,0 +1,121 @@
+import json
+import os
+import zlib
+
+from .model import CountryEnum, CurrencyEnum, SubdivisionWithParentEnum
+
+
+class Shard:
+    def __init__(self, index, count):
+        if count < 1 or not 0 <= index < count:
+            raise ValueError("Invalid shard {0}/{1}".format(index, count))
+        self.index = index
+        self.count = count
+
+    @staticmethod
+    def parse(value):
+        index, count = value.split('/')
+        return Shard(int(index), int(count))
+
+    def owns(self, country_code):
+        return zlib.crc32(country_code.encode('utf-8')) % self.count == self.index
+
+    def filter(self, countries):
+        return [country for country in countries if self.owns(country.code)]
+
+    def file_name(self):
+        return 'shard-{0}-of-{1}.json'.format(self.index, self.count)
+
+
+UNPARTITIONED_SOURCES = ('iso.countries', 'geonames.countries', 'ifcmarkets.crypto_currencies', 'geonames.currencies',
+                         'iso.currencies', 'iso.deprecated_currencies')
+
+
+def write_shard(folder_path, shard, sources, digests):
+    payload = {
+        'shard': shard.index,
+        'shards': shard.count,
+        'digests': digests,
+        'iso.countries': [to_country_row(country) for country in sources['iso.countries']],
+        'geonames.countries': [to_country_row(country) for country in sources['geonames.countries']],
+        'iso.subdivisions': {code: [to_subdivision_row(subdivision) for subdivision in subdivisions]
+                             for code, subdivisions in sources['iso.subdivisions'].items()},
+        'geonames.subdivisions': {code: [to_subdivision_row(subdivision) for subdivision in subdivisions]
+                                  for code, subdivisions in sources['geonames.subdivisions'].items()},
+        'ifcmarkets.crypto_currencies': [to_currency_row(currency)
+                                         for currency in sources['ifcmarkets.crypto_currencies']],
+        'geonames.currencies': sources['geonames.currencies'],
+        'iso.currencies': [to_currency_row(currency)
+                           for currency in sorted(sources['iso.currencies'], key=lambda currency: currency.code)],
+        'iso.deprecated_currencies': [to_currency_row(currency) for currency in sorted(
+            sources['iso.deprecated_currencies'], key=lambda currency: currency.code)],
+    }
+    os.makedirs(folder_path, exist_ok=True)
+    path = os.path.join(folder_path, shard.file_name())
+    temporary_path = '{0}.tmp'.format(path)
+    with open(temporary_path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(temporary_path, path)
+    return path
+
+
+def read_shards(folder_path, shard_count):
+    payloads = []
+    for index in range(shard_count):
+        path = os.path.join(folder_path, Shard(index, shard_count).file_name())
+        if not os.path.exists(path):
+            raise FileNotFoundError("Missing partial result of shard {0}/{1}: {2}".format(index, shard_count, path))
+        with open(path, encoding='utf-8') as f:
+            payloads.append(json.load(f))
+
+    # Sources that are not partitioned are fetched by every shard, they must agree before those of the first shard
+    # are kept, otherwise a shard whose fetch failed would silently drop or replace data of the others
+    first = payloads[0]
+    for index, payload in enumerate(payloads):
+        if payload['shard'] != index or payload['shards'] != shard_count:
+            raise ValueError("Partial result {0} belongs to shard {1}/{2}, expected {3}/{4}".format(
+                Shard(index, shard_count).file_name(), payload['shard'], payload['shards'], index, shard_count))
+        for source in UNPARTITIONED_SOURCES:
+            if payload[source] != first[source]:
+                raise ValueError("Shards 0/{0} and {1}/{0} fetched different {2}, run the failed shard again".format(
+                    shard_count, index, source))
+    iso_org_countries = [CountryEnum(*row) for row in first['iso.countries']]
+    geonames_countries = [CountryEnum(*row) for row in first['geonames.countries']]
+    iso_org_country_index = {country.code: country for country in iso_org_countries}
+    country_index = dict({country.code: country for country in geonames_countries}, **iso_org_country_index)
+
+    iso_org_country_subdivisions = {}
+    geonames_country_subdivisions = {}
+    digests = {}
+    for payload in payloads:
+        for code, rows in payload['iso.subdivisions'].items():
+            iso_org_country_subdivisions[code] = [SubdivisionWithParentEnum(*row, iso_org_country_index[code])
+                                                  for row in rows]
+        for code, rows in payload['geonames.subdivisions'].items():
+            geonames_country_subdivisions[code] = [SubdivisionWithParentEnum(*row, country_index[code])
+                                                   for row in rows]
+        digests.update(payload['digests'])
+
+    sources = {
+        'iso.countries': iso_org_countries,
+        'geonames.countries': geonames_countries,
+        'iso.subdivisions': iso_org_country_subdivisions,
+        'geonames.subdivisions': geonames_country_subdivisions,
+        'ifcmarkets.crypto_currencies': [CurrencyEnum(*row) for row in first['ifcmarkets.crypto_currencies']],
+        'geonames.currencies': first['geonames.currencies'],
+        'iso.currencies': {CurrencyEnum(*row) for row in first['iso.currencies']},
+        'iso.deprecated_currencies': {CurrencyEnum(*row) for row in first['iso.deprecated_currencies']},
+    }
+    return sources, digests
+
+
+def to_country_row(country):
+    return [country.code, country.name, country.continent, country.currency]
+
+
+def to_subdivision_row(subdivision):
+    return [subdivision.code, subdivision.name, subdivision.type, subdivision.parent]
+
+
+def to_currency_row(currency):
+    return [currency.code, currency.name, currency.symbol, currency.test]
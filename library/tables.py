@@ -0,0 +1,19 @@
+def parse_tables(content, **attrs):
+    from bs4 import BeautifulSoup, SoupStrainer
+
+    return BeautifulSoup(content, "html.parser", parse_only=SoupStrainer("table", attrs=attrs))
+
+
+def get_table_rows(table):
+    if table is None:
+        return None
+    rows = []
+    for row in table.find_all("tr"):
+        cells = row.find_all("td")
+        if cells:
+            rows.append(tuple(cell.get_text() for cell in cells))
+    return rows
+
+
+def extract_table_rows(content, **attrs):
+    return get_table_rows(parse_tables(content, **attrs).find("table", attrs=attrs))